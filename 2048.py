@@ -4,6 +4,7 @@ Clone of 2048 game.
 
 import poc_2048_gui
 import random
+import time
 
 # Directions, DO NOT MODIFY
 UP = 1
@@ -62,11 +63,13 @@ class TwentyFortyEight:
     Class to run the game logic.
     """
 
-    def __init__(self, grid_height, grid_width):
+    def __init__(self, grid_height, grid_width, verbose = True):
         self.grid_height = grid_height
         self.grid_width = grid_width
+        # Debugging output of __init__ and new_tile, off for headless play
+        self.verbose = verbose
         #self.grid_values = [[0] * grid_width] * grid_height
-        self.grid_values = [([0] * grid_width) for dummy_i in range(grid_height)]
+        self.reset()
 
         up_indice = range(grid_width)
         for dummy_i in range(grid_width):
@@ -90,7 +93,8 @@ class TwentyFortyEight:
                                     LEFT:left_indice,
                                     RIGHT:right_indice
                                     }
-        print self.initial_indice_dict
+        if self.verbose:
+            print self.initial_indice_dict
         self.limit_dict = {
                             UP:grid_height,
                             DOWN:grid_height,
@@ -103,6 +107,11 @@ class TwentyFortyEight:
         Reset the game so the grid is empty.
         """
         self.grid_values = [([0] * self.grid_width) for dummy_i in range(self.grid_height)]
+        # Empty squares in any order, and the position of each square
+        # in that list, kept in sync by set_tile
+        self.empty_cells = [(row, col) for row in range(self.grid_height)
+                            for col in range(self.grid_width)]
+        self.empty_index = dict([(cell, pos) for pos, cell in enumerate(self.empty_cells)])
 
     def __str__(self):
         """
@@ -157,29 +166,52 @@ class TwentyFortyEight:
         square.  The tile should be 2 90% of the time and
         4 10% of the time.
         """
-        dummy_count = 0
-        for dummy_i in range(self.grid_height):
-            dummy_count += self.grid_values[dummy_i].count(0)
-        if dummy_count == 0:
+        if not self.empty_cells:
             return
-        while(True):
-            row = random.randint(0,self.grid_height-1)
-            col = random.randint(0,self.grid_width-1)
-            if(self.grid_values[row][col] == 0):
-                dummy_r = random.random()
-                print dummy_r
-                if dummy_r < 0.9:
-                    self.grid_values[row][col] = 2
-                else:
-                    self.grid_values[row][col] = 4
-                break
-        print self.grid_values
-        
+        row, col = random.choice(self.empty_cells)
+        dummy_r = random.random()
+        if self.verbose:
+            print dummy_r
+        if dummy_r < 0.9:
+            self.set_tile(row, col, 2)
+        else:
+            self.set_tile(row, col, 4)
+        if self.verbose:
+            print self.grid_values
+
+    def is_game_over(self):
+        """
+        Return True if the game is lost: there is no empty square and
+        no two neighbouring tiles are equal, so no move can change the
+        grid.
+        """
+        if self.empty_cells:
+            return False
+        for row in range(self.grid_height):
+            for col in range(self.grid_width):
+                value = self.grid_values[row][col]
+                if col + 1 < self.grid_width and self.grid_values[row][col + 1] == value:
+                    return False
+                if row + 1 < self.grid_height and self.grid_values[row + 1][col] == value:
+                    return False
+        return True
+
     def set_tile(self, row, col, value):
         """
         Set the tile at position row, col to have the given value.
         """
+        old_value = self.grid_values[row][col]
         self.grid_values[row][col] = value
+        if old_value == 0 and value != 0:
+            # Move the last empty square into the place of this one
+            pos = self.empty_index.pop((row, col))
+            last = self.empty_cells.pop()
+            if last != (row, col):
+                self.empty_cells[pos] = last
+                self.empty_index[last] = pos
+        elif old_value != 0 and value == 0:
+            self.empty_index[(row, col)] = len(self.empty_cells)
+            self.empty_cells.append((row, col))
 
     def get_tile(self, row, col):
         """
@@ -188,4 +220,263 @@ class TwentyFortyEight:
         return self.grid_values[row][col]
 
 
-poc_2048_gui.run_gui(TwentyFortyEight(4, 5))
\ No newline at end of file
+# Packed 4x4 boards: tile (row, col) is stored as a 4 bit exponent at
+# bit 4 * (4 * row + col) of an integer, 0 for an empty square.  Each
+# row is a 16 bit value that ROW_LEFT and ROW_RIGHT map to the row
+# moved towards column 0 or towards the last column.
+PACKED_SIZE = 4
+MAX_EXPONENT = 15   # Largest tile is 2 ** 15, larger merges are capped
+ROW_MASK = 0xFFFF
+ROW_LEFT = []
+ROW_RIGHT = []
+
+def tile_exponent(value):
+    """
+    Return the exponent of a tile value, 0 for an empty square
+    """
+    if value == 0:
+        return 0
+    exponent = value.bit_length() - 1
+    if value != 1 << exponent or not 0 < exponent <= MAX_EXPONENT:
+        raise ValueError("tile values must be powers of two up to %d" % (1 << MAX_EXPONENT))
+    return exponent
+
+def pack_line(line):
+    """
+    Return the packed row of a list of tile values, capping merged
+    tiles at 2 ** MAX_EXPONENT
+    """
+    row = 0
+    for col in range(len(line)):
+        if line[col]:
+            exponent = min(line[col].bit_length() - 1, MAX_EXPONENT)
+            row |= exponent << (4 * col)
+    return row
+
+def unpack_line(row):
+    """
+    Return the list of tile values of a packed row
+    """
+    line = []
+    for col in range(PACKED_SIZE):
+        exponent = (row >> (4 * col)) & 0xF
+        if exponent:
+            line.append(1 << exponent)
+        else:
+            line.append(0)
+    return line
+
+def row_tables():
+    """
+    Fill ROW_LEFT and ROW_RIGHT on first use by running merge on
+    every packed row
+    """
+    if ROW_LEFT:
+        return
+    for row in range(ROW_MASK + 1):
+        line = unpack_line(row)
+        ROW_LEFT.append(pack_line(merge(list(line))))
+        ROW_RIGHT.append(pack_line(merge(line[::-1])[::-1]))
+
+def transpose_board(board):
+    """
+    Return the packed board with rows and columns swapped
+    """
+    part1 = board & 0xF0F00F0FF0F00F0F
+    part2 = board & 0x0000F0F00000F0F0
+    part3 = board & 0x0F0F00000F0F0000
+    board = part1 | (part2 << 12) | (part3 >> 12)
+    part1 = board & 0xFF00FF0000FF00FF
+    part2 = board & 0x00FF00FF00000000
+    part3 = board & 0x00000000FF00FF00
+    return part1 | (part2 >> 24) | (part3 << 24)
+
+def move_board(board, direction):
+    """
+    Return the packed board after moving all tiles in the given
+    direction, without adding a new tile.  UP and DOWN move the rows
+    of the transposed board.
+    """
+    if direction == LEFT or direction == UP:
+        table = ROW_LEFT
+    else:
+        table = ROW_RIGHT
+    if direction == UP or direction == DOWN:
+        board = transpose_board(board)
+    result = (table[board & ROW_MASK] |
+              table[(board >> 16) & ROW_MASK] << 16 |
+              table[(board >> 32) & ROW_MASK] << 32 |
+              table[(board >> 48) & ROW_MASK] << 48)
+    if direction == UP or direction == DOWN:
+        result = transpose_board(result)
+    return result
+
+def game_score(tiles, fours):
+    """
+    Return the game score, the sum of all tiles created by merges,
+    from the tile values of a grid and the number of 4 tiles that
+    were added by new_tile
+    """
+    total = 0
+    for value in tiles:
+        if value >= 4:
+            total += (value.bit_length() - 2) * value
+    return total - 4 * fours
+
+def empty_squares(board):
+    """
+    Return the indices 4 * row + col of the empty squares of a packed
+    board
+    """
+    return [index for index in range(PACKED_SIZE * PACKED_SIZE)
+            if not (board >> (4 * index)) & 0xF]
+
+
+class PackedTwentyFortyEight(TwentyFortyEight):
+    """
+    4x4 game with the grid packed into one integer and moves done by
+    table lookups.  Has the same interface as TwentyFortyEight.
+    """
+
+    def __init__(self, grid_height = PACKED_SIZE, grid_width = PACKED_SIZE, verbose = False):
+        if grid_height != PACKED_SIZE or grid_width != PACKED_SIZE:
+            raise ValueError("packed boards are %dx%d" % (PACKED_SIZE, PACKED_SIZE))
+        row_tables()
+        self.grid_height = grid_height
+        self.grid_width = grid_width
+        self.verbose = verbose
+        self.board = 0
+
+    def reset(self):
+        """
+        Reset the game so the grid is empty.
+        """
+        self.board = 0
+
+    def move(self, direction):
+        """
+        Move all tiles in the given direction and add
+        a new tile, like TwentyFortyEight.move.
+        """
+        self.board = move_board(self.board, direction)
+        self.new_tile()
+
+    def new_tile(self):
+        """
+        Create a new tile in a randomly selected empty
+        square.  The tile should be 2 90% of the time and
+        4 10% of the time.
+        """
+        empty = empty_squares(self.board)
+        if not empty:
+            return
+        index = random.choice(empty)
+        if random.random() < 0.9:
+            self.board |= 1 << (4 * index)
+        else:
+            self.board |= 2 << (4 * index)
+
+    def is_game_over(self):
+        """
+        Return True if no move can change the grid.
+        """
+        for direction in (UP, DOWN, LEFT, RIGHT):
+            if move_board(self.board, direction) != self.board:
+                return False
+        return True
+
+    def set_tile(self, row, col, value):
+        """
+        Set the tile at position row, col to have the given value.
+        """
+        shift = 4 * (PACKED_SIZE * row + col)
+        self.board = (self.board & ~(0xF << shift)) | (tile_exponent(value) << shift)
+
+    def get_tile(self, row, col):
+        """
+        Return the value of the tile at position row, col.
+        """
+        exponent = (self.board >> (4 * (PACKED_SIZE * row + col))) & 0xF
+        if exponent:
+            return 1 << exponent
+        return 0
+
+
+def run_move_benchmark(boards = 20000, seed = 0):
+    """
+    Print the time per move of TwentyFortyEight and
+    PackedTwentyFortyEight, moving the same random 4x4 boards in all
+    four directions without adding new tiles
+    """
+    rng = random.Random(seed)
+    grids = [[[rng.choice([0, 0, 2, 4, 8, 16, 32]) for dummy_col in range(4)]
+              for dummy_row in range(4)] for dummy_grid in range(boards)]
+    for game_class in (TwentyFortyEight, PackedTwentyFortyEight):
+        game = game_class(4, 4, False)
+        game.new_tile = lambda: None
+        elapsed = 0.0
+        for grid in grids:
+            for row in range(4):
+                for col in range(4):
+                    game.set_tile(row, col, grid[row][col])
+            start = time.time()
+            for direction in (UP, LEFT, DOWN, RIGHT):
+                game.move(direction)
+            elapsed += time.time() - start
+        print "%-22s %8.2f us per move" % (game_class.__name__, 1e6 * elapsed / (4 * boards))
+
+def rejection_new_tile(game):
+    """
+    The previous TwentyFortyEight.new_tile, without printing: count
+    the empty squares, then draw random squares until one is empty
+    """
+    count = 0
+    for row in range(game.grid_height):
+        count += game.grid_values[row].count(0)
+    if count == 0:
+        return
+    while True:
+        row = random.randint(0, game.grid_height - 1)
+        col = random.randint(0, game.grid_width - 1)
+        if game.grid_values[row][col] == 0:
+            if random.random() < 0.9:
+                game.set_tile(row, col, 2)
+            else:
+                game.set_tile(row, col, 4)
+            return
+
+def run_new_tile_benchmark(sizes = (4, 8, 16, 32), fills = (0.0, 0.5, 0.9, 0.99),
+                           spawns = 2000, seed = 0):
+    """
+    Print the time per new tile of new_tile and of
+    rejection_new_tile on square boards with a fraction of the
+    squares filled.  Each new tile is removed again so the fill stays
+    the same.
+    """
+    random.seed(seed)
+    for size in sizes:
+        for fill in fills:
+            game = TwentyFortyEight(size, size, False)
+            cells = [(row, col) for row in range(size) for col in range(size)]
+            random.shuffle(cells)
+            for row, col in cells[:min(int(fill * size * size), size * size - 1)]:
+                game.set_tile(row, col, 2 ** random.randint(3, 10))
+            line = "%2dx%-2d %3.0f%% full" % (size, size, 100 * fill)
+            for name, spawn in (("new_tile", game.new_tile),
+                                ("rejection", lambda: rejection_new_tile(game))):
+                elapsed = 0.0
+                for dummy_spawn in range(spawns):
+                    start = time.time()
+                    spawn()
+                    elapsed += time.time() - start
+                    for row, col in cells:
+                        if game.grid_values[row][col] in (2, 4):
+                            game.set_tile(row, col, 0)
+                            break
+                line += "  %-9s %8.2f us" % (name, 1e6 * elapsed / spawns)
+            print line
+
+
+#poc_2048_gui.run_gui(TwentyFortyEight(4, 5))
+#run_move_benchmark()
+#run_new_tile_benchmark()
\ No newline at end of file
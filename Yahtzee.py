@@ -3,9 +3,40 @@ Planner for Yahtzee
 Simplifications:  only allow discard and roll, only score against upper level
 """
 
-# Used to increase the timeout, if necessary
-import codeskulptor
-codeskulptor.set_timeout(20)
+import collections
+import time
+
+# Used to increase the timeout, if necessary.  Outside CodeSkulptor
+# there is no timeout to raise.
+try:
+    import codeskulptor
+    codeskulptor.set_timeout(20)
+except ImportError:
+    pass
+
+# Maximum number of hold evaluations kept by HOLD_CACHE
+HOLD_CACHE_SIZE = 100000
+
+# Objectives of strategy
+MAXIMIZE_MEAN = "mean"
+MAXIMIZE_AT_LEAST = "at_least"
+
+# PlannerProfile collecting counters and timings, None when profiling
+# is disabled; see enable_profiling
+PROFILER = None
+
+# Caches of the multiset engine: face-count vectors of a roll keyed on
+# (num_die_sides, num_dice), and scores keyed on hand face counts
+_COUNT_VECTORS = {}
+_SCORE_TABLE = {}
+
+# Holds of every five-die hand with six sided dice, keyed on the
+# sorted hand
+_HOLD_TABLE = {}
+
+# Cache of the NumPy kernel: roll count arrays keyed on
+# (num_die_sides, num_dice, num_faces)
+_ROLL_ARRAYS = {}
 
 def gen_all_sequences(outcomes, length):
     """
@@ -43,6 +74,92 @@ def gen_all_combinations(outcomes, length):
         answer_set = temp_set
     return answer_set
 
+def _distinct(outcomes):
+    """
+    Return the distinct outcomes in order of first appearance and the
+    number of times each appears
+    """
+    items = []
+    limits = []
+    for item in outcomes:
+        if item in items:
+            limits[items.index(item)] += 1
+        else:
+            items.append(item)
+            limits.append(1)
+    return items, limits
+
+def iter_sequences(outcomes, length):
+    """
+    Generator that yields the sequences of gen_all_sequences one at a
+    time, counting through them like an odometer, so only the current
+    sequence is kept in memory.
+    """
+    items = _distinct(outcomes)[0]
+    if length > 0 and not items:
+        return
+    indices = [0] * length
+    while True:
+        yield tuple([items[idx] for idx in indices])
+        pos = length - 1
+        while pos >= 0 and indices[pos] == len(items) - 1:
+            indices[pos] = 0
+            pos -= 1
+        if pos < 0:
+            return
+        indices[pos] += 1
+
+def iter_combinations(outcomes, length):
+    """
+    Generator that yields the sequences of gen_all_combinations one at
+    a time by depth-first search, using each outcome at most as often
+    as it appears in outcomes, so only the current sequence is kept
+    in memory.
+    """
+    items, limits = _distinct(outcomes)
+    used = [0] * len(items)
+    chosen = []
+    candidate = 0
+    while True:
+        if len(chosen) == length:
+            yield tuple([items[idx] for idx in chosen])
+            candidate = len(items)
+        while candidate < len(items) and used[candidate] == limits[candidate]:
+            candidate += 1
+        if candidate < len(items):
+            used[candidate] += 1
+            chosen.append(candidate)
+            candidate = 0
+        elif chosen:
+            candidate = chosen.pop()
+            used[candidate] -= 1
+            candidate += 1
+        else:
+            return
+
+def count_sequences(outcomes, length):
+    """
+    Return the number of sequences gen_all_sequences would enumerate
+    """
+    return len(_distinct(outcomes)[0]) ** length
+
+def count_combinations(outcomes, length):
+    """
+    Return the number of sequences gen_all_combinations would
+    enumerate.  Outcomes are added one distinct value at a time,
+    counting the ways to interleave its copies with shorter sequences.
+    """
+    ways = [1] + [0] * length
+    for limit in _distinct(outcomes)[1]:
+        new_ways = [0] * (length + 1)
+        for size in range(length + 1):
+            if not ways[size]:
+                continue
+            for copies in range(min(limit, length - size) + 1):
+                new_ways[size + copies] += ways[size] * _binomial(size + copies, copies)
+        ways = new_ways
+    return ways[length]
+
 def score(hand):
     """
     Compute the maximal score for a Yahtzee hand according to the
@@ -65,11 +182,97 @@ def score(hand):
     return max_value
 
 
+def _binomial(num, choose):
+    """
+    Return the binomial coefficient num choose choose
+    """
+    result = 1
+    for idx in range(choose):
+        result = result * (num - idx) // (idx + 1)
+    return result
+
+def gen_count_vectors(num_die_sides, num_dice):
+    """
+    Iterative function that enumerates the distinct outcomes of
+    rolling num_dice dice as face-count vectors, where entry i counts
+    the dice showing i + 1, together with the number of ordered
+    sequences giving each outcome (the multinomial coefficient).
+
+    Returns a list of (counts, weight) tuples
+    """
+    key = (num_die_sides, num_dice)
+    if key in _COUNT_VECTORS:
+        return _COUNT_VECTORS[key]
+    # Partial vectors over the first faces, with the dice still to place
+    partial = [((), num_dice, 1)]
+    for face in range(num_die_sides):
+        extended = []
+        for counts, remaining, weight in partial:
+            if face == num_die_sides - 1:
+                choices = [remaining]
+            else:
+                choices = range(remaining + 1)
+            for count in choices:
+                extended.append((counts + (count,), remaining - count,
+                                 weight * _binomial(remaining, count)))
+        partial = extended
+    vectors = [(counts, weight) for counts, dummy_remaining, weight in partial]
+    _COUNT_VECTORS[key] = vectors
+    return vectors
+
+def count_score(counts):
+    """
+    Compute the maximal upper section score of a hand given as a
+    face-count vector.  Scores are looked up in a table filled on
+    first use.
+    """
+    if PROFILER is not None:
+        PROFILER.count("score_calls")
+        hit = counts in _SCORE_TABLE
+        PROFILER.count("score_table_hits", int(hit))
+        PROFILER.count("score_table_misses", int(not hit))
+    if counts not in _SCORE_TABLE:
+        _SCORE_TABLE[counts] = max([(face + 1) * counts[face]
+                                    for face in range(len(counts))] + [0])
+    return _SCORE_TABLE[counts]
+
 def expected_value(held_dice, num_die_sides, num_free_dice):
     """
     Compute the expected value of the held_dice given that there
     are num_free_dice to be rolled, each with num_die_sides.
 
+    Enumerates sorted outcomes weighted by their multiplicity instead
+    of every ordered sequence; the result equals that of
+    expected_value_sequences exactly.
+
+    held_dice: dice that you will hold
+    num_die_sides: number of sides on each die
+    num_free_dice: number of dice to be rolled
+
+    Returns a floating point expected value
+    """
+    num_faces = max([num_die_sides] + list(held_dice))
+    held_counts = [0] * num_faces
+    for die in held_dice:
+        held_counts[die - 1] += 1
+    padding = [0] * (num_faces - num_die_sides)
+    vectors = gen_count_vectors(num_die_sides, num_free_dice)
+    if PROFILER is not None:
+        PROFILER.count("expected_value_calls")
+        PROFILER.count("expected_value_outcomes", len(vectors))
+    total_score = 0
+    for counts, weight in vectors:
+        hand = tuple([held_counts[face] + roll for face, roll
+                      in enumerate(list(counts) + padding)])
+        total_score += weight * count_score(hand)
+    return total_score / float(num_die_sides ** num_free_dice)
+
+def expected_value_sequences(held_dice, num_die_sides, num_free_dice):
+    """
+    Compute the expected value of the held_dice given that there
+    are num_free_dice to be rolled, each with num_die_sides, by
+    enumerating every ordered sequence of rolls.
+
     held_dice: dice that you will hold
     num_die_sides: number of sides on each die
     num_free_dice: number of dice to be rolled
@@ -77,7 +280,7 @@ def expected_value(held_dice, num_die_sides, num_free_dice):
     Returns a floating point expected value
     """
     outcomes = [dummy_i for dummy_i in range(1,num_die_sides+1)]
-    all_seq = gen_all_sequences(outcomes,num_free_dice)
+    all_seq = iter_sequences(outcomes,num_free_dice)
     total_score = 0.0
     count = 0.0
     for dummy_seq in all_seq:
@@ -89,6 +292,192 @@ def expected_value(held_dice, num_die_sides, num_free_dice):
     
     return total_score / count
 
+def score_summary(held_dice, num_die_sides, num_free_dice):
+    """
+    Compute the expected value and the probability distribution of
+    the score of the held_dice given that there are num_free_dice to
+    be rolled, each with num_die_sides, in one pass over the sorted
+    outcomes.  The expected value equals that of expected_value
+    exactly.
+
+    Returns a tuple where the first element is the expected value and
+    the second element is the distribution as in score_distribution
+    """
+    num_faces = max([num_die_sides] + list(held_dice))
+    held_counts = [0] * num_faces
+    for die in held_dice:
+        held_counts[die - 1] += 1
+    padding = [0] * (num_faces - num_die_sides)
+    vectors = gen_count_vectors(num_die_sides, num_free_dice)
+    if PROFILER is not None:
+        PROFILER.count("score_summary_calls")
+        PROFILER.count("score_summary_outcomes", len(vectors))
+    weights = {}
+    for counts, weight in vectors:
+        hand = tuple([held_counts[face] + roll for face, roll
+                      in enumerate(list(counts) + padding)])
+        hand_score = count_score(hand)
+        weights[hand_score] = weights.get(hand_score, 0) + weight
+    total = float(num_die_sides ** num_free_dice)
+    total_score = sum([hand_score * weight for hand_score, weight in weights.items()])
+    return (total_score / total,
+            tuple([(hand_score, weights[hand_score] / total)
+                   for hand_score in sorted(weights)]))
+
+def score_distribution(held_dice, num_die_sides, num_free_dice):
+    """
+    Compute the probability distribution of the score of the held_dice
+    given that there are num_free_dice to be rolled, each with
+    num_die_sides.
+
+    Returns a tuple of (score, probability) pairs in increasing order
+    of score
+    """
+    return score_summary(held_dice, num_die_sides, num_free_dice)[1]
+
+def distribution_mean(distribution):
+    """
+    Return the mean of a score distribution
+    """
+    return sum([hand_score * prob for hand_score, prob in distribution])
+
+def distribution_variance(distribution):
+    """
+    Return the variance of a score distribution
+    """
+    mean = distribution_mean(distribution)
+    return sum([prob * (hand_score - mean) ** 2 for hand_score, prob in distribution])
+
+def distribution_quantile(distribution, fraction):
+    """
+    Return the smallest score whose cumulative probability reaches
+    fraction, e.g. 0.5 for the median
+    """
+    cumulative = 0.0
+    for hand_score, prob in distribution:
+        cumulative += prob
+        if cumulative >= fraction - 1e-12:
+            return hand_score
+    return distribution[-1][0]
+
+def probability_at_least(distribution, target):
+    """
+    Return the probability that the score is at least target
+    """
+    return sum([prob for hand_score, prob in distribution if hand_score >= target])
+
+
+class HoldCache:
+    """
+    Least recently used cache of evaluations of holds, keyed on the
+    sorted hold, the number of die sides and the number of free dice.
+    Holds are evaluated with score_summary unless another function
+    with the same arguments is given.
+    """
+
+    def __init__(self, max_size = HOLD_CACHE_SIZE, evaluate = None):
+        """
+        Create a cache of at most max_size holds
+        """
+        if evaluate is None:
+            evaluate = score_summary
+        self._evaluate = evaluate
+        self._max_size = max_size
+        self._values = collections.OrderedDict()
+        self.reset_stats()
+
+    def clear(self):
+        """
+        Forget all cached holds
+        """
+        self._values.clear()
+
+    def reset_stats(self):
+        """
+        Zero the hit, miss and eviction counters
+        """
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def stats(self):
+        """
+        Return a dictionary of cache counters
+        """
+        lookups = self._hits + self._misses
+        if lookups:
+            hit_rate = float(self._hits) / lookups
+        else:
+            hit_rate = 0.0
+        return {"hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": hit_rate,
+                "evictions": self._evictions,
+                "size": len(self._values)}
+
+    def get(self, held_dice, num_die_sides, num_free_dice):
+        """
+        Return the evaluation of the hold, by default
+        expected_value(held_dice, num_die_sides, num_free_dice),
+        computing it only on a cache miss
+        """
+        key = (tuple(sorted(held_dice)), num_die_sides, num_free_dice)
+        value = self._values.pop(key, None)
+        if value is None:
+            self._misses += 1
+            value = self._evaluate(key[0], num_die_sides, num_free_dice)
+            if len(self._values) >= self._max_size:
+                self._values.popitem(last=False)
+                self._evictions += 1
+        else:
+            self._hits += 1
+        self._values[key] = value
+        return value
+
+HOLD_CACHE = HoldCache()
+
+
+def iter_holds(hand):
+    """
+    Generator that yields each distinct sorted hold of hand exactly
+    once.  Holds are counted off the face-count vector of the hand
+    like an odometer, so only the current hold is kept in memory.
+
+    hand: full yahtzee hand
+
+    Yields tuples, where each tuple is dice to hold
+    """
+    face_counts = {}
+    for die in hand:
+        face_counts[die] = face_counts.get(die, 0) + 1
+    faces = sorted(face_counts.keys())
+    limits = [face_counts[face] for face in faces]
+    chosen = [0] * len(faces)
+    while True:
+        hold = []
+        for idx in range(len(faces)):
+            hold.extend([faces[idx]] * chosen[idx])
+        yield tuple(hold)
+        pos = len(faces) - 1
+        while pos >= 0 and chosen[pos] == limits[pos]:
+            chosen[pos] = 0
+            pos -= 1
+        if pos < 0:
+            return
+        chosen[pos] += 1
+
+def hold_table():
+    """
+    Return the table of holds of every sorted five-die hand with six
+    sided dice, building it on first use
+    """
+    if not _HOLD_TABLE:
+        for counts, dummy_weight in gen_count_vectors(6, 5):
+            hand = []
+            for face in range(6):
+                hand.extend([face + 1] * counts[face])
+            _HOLD_TABLE[tuple(hand)] = frozenset(iter_holds(hand))
+    return _HOLD_TABLE
 
 def gen_all_holds(hand):
     """
@@ -98,39 +487,299 @@ def gen_all_holds(hand):
 
     Returns a set of tuples, where each tuple is dice to hold
     """
-    length = len(hand)
-    all_hold = set([()])
-    for dummy_i in range(length):
-        current_hold = gen_all_combinations(hand,dummy_i+1)
-        for dummy_hold in current_hold:
-            all_hold.add(tuple(sorted(dummy_hold)))
-    
-    return all_hold
+    holds = hold_table().get(tuple(sorted(hand)))
+    if PROFILER is not None:
+        PROFILER.count("gen_all_holds_calls")
+        PROFILER.count("hold_table_hits", int(holds is not None))
+    if holds is None:
+        holds = set(iter_holds(hand))
+    else:
+        holds = set(holds)
+    if PROFILER is not None:
+        PROFILER.count("holds_generated", len(holds))
+    return holds
+
+
+
+class PlannerProfile:
+    """
+    Counters and phase timings of the planner.  Every strategy call
+    while the profile is enabled produces a report dictionary with the
+    hand, the result, the wall time of each phase in milliseconds and
+    the counters and hold cache lookups of that call.
+    """
+
+    def __init__(self, emit = None):
+        """
+        Create an empty profile.  emit, if given, is called with each
+        report as it is produced.
+        """
+        self._emit = emit
+        self.counters = {}
+        self.reports = []
+        self._call_counters = None
+        self._call_times = None
+        self._cache_stats = None
+
+    def count(self, name, amount = 1):
+        """
+        Add amount to the counter name
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def begin_call(self):
+        """
+        Start the report of a strategy call
+        """
+        self._call_counters = dict(self.counters)
+        self._call_times = {}
+        self._cache_stats = HOLD_CACHE.stats()
 
+    def add_time(self, phase, seconds):
+        """
+        Add wall time to a phase of the current strategy call
+        """
+        self._call_times[phase] = self._call_times.get(phase, 0.0) + 1000.0 * seconds
+
+    def end_call(self, hand, num_die_sides, objective, result):
+        """
+        Finish the report of a strategy call and return it
+        """
+        counters = {}
+        for name, value in self.counters.items():
+            if value != self._call_counters.get(name, 0):
+                counters[name] = value - self._call_counters.get(name, 0)
+        after = HOLD_CACHE.stats()
+        caches = {"hold_cache": {"hits": after["hits"] - self._cache_stats["hits"],
+                                 "misses": after["misses"] - self._cache_stats["misses"]}}
+        report = {"hand": tuple(hand), "num_die_sides": num_die_sides,
+                  "objective": objective, "value": result[0], "hold": result[1],
+                  "phases_ms": self._call_times, "wall_ms": sum(self._call_times.values()),
+                  "counters": counters, "caches": caches}
+        self.reports.append(report)
+        if self._emit is not None:
+            self._emit(report)
+        return report
+
+def enable_profiling(emit = None):
+    """
+    Start collecting a new PlannerProfile and return it
+    """
+    global PROFILER
+    PROFILER = PlannerProfile(emit)
+    return PROFILER
 
+def disable_profiling():
+    """
+    Stop profiling and return the profile collected, if any
+    """
+    global PROFILER
+    profile = PROFILER
+    PROFILER = None
+    return profile
 
-def strategy(hand, num_die_sides):
+def strategy(hand, num_die_sides, objective = MAXIMIZE_MEAN, target = 0):
     """
     Compute the hold that maximizes the expected value when the
-    discarded dice are rolled.
+    discarded dice are rolled, or with objective MAXIMIZE_AT_LEAST
+    the probability that the score is at least target.
 
     hand: full yahtzee hand
     num_die_sides: number of sides on each die
 
-    Returns a tuple where the first element is the expected score and
-    the second element is a tuple of the dice to hold
+    Returns a tuple where the first element is the expected score, or
+    the probability, and the second element is a tuple of the dice to
+    hold
     """
+    profile = PROFILER
+    if profile is not None:
+        profile.begin_call()
+        start = time.time()
     all_hold = gen_all_holds(hand)
+    if profile is not None:
+        profile.add_time("gen_all_holds", time.time() - start)
+        start = time.time()
     max_value = 0.0
     max_value_hold = ()
     for dummy_hold in all_hold:
-        value = expected_value(dummy_hold, num_die_sides, len(hand) - len(dummy_hold))
+        summary = HOLD_CACHE.get(dummy_hold, num_die_sides, len(hand) - len(dummy_hold))
+        if objective == MAXIMIZE_MEAN:
+            value = summary[0]
+        elif objective == MAXIMIZE_AT_LEAST:
+            value = probability_at_least(summary[1], target)
+        else:
+            raise ValueError("unknown objective: %s" % objective)
         if value > max_value:
             max_value = value
             max_value_hold = dummy_hold
+    if profile is not None:
+        profile.add_time("evaluate_holds", time.time() - start)
+        profile.end_call(hand, num_die_sides, objective, (max_value, max_value_hold))
     return (max_value, max_value_hold)
 
 
+def strategy_many(hands, num_die_sides):
+    """
+    Compute strategy for each hand in a batch.  Hands with the same
+    dice are solved once and all holds share HOLD_CACHE.
+
+    hands: iterable of full yahtzee hands
+    num_die_sides: number of sides on each die
+
+    Returns a list of strategy results in the order of hands
+    """
+    solved = {}
+    results = []
+    for hand in hands:
+        key = tuple(sorted(hand))
+        if key not in solved:
+            solved[key] = strategy(key, num_die_sides)
+        results.append(solved[key])
+    return results
+
+
+def score_batch(hands):
+    """
+    Vectorized score for many hands at once.  Face counts of all rows
+    are computed with a single bincount over row-offset dice values.
+
+    hands: 2-D array-like of dice, one hand per row
+
+    Returns a NumPy array with the score of each hand
+    """
+    # Imported here since CodeSkulptor has no NumPy
+    import numpy
+    hands = numpy.asarray(hands, dtype=int)
+    num_rows = hands.shape[0]
+    if hands.size == 0:
+        return numpy.zeros(num_rows, dtype=int)
+    width = hands.max() + 1
+    offsets = hands + width * numpy.arange(num_rows)[:, None]
+    counts = numpy.bincount(offsets.ravel(), minlength=num_rows * width)
+    counts = counts.reshape(num_rows, width)
+    return (counts * numpy.arange(width)).max(axis=1)
+
+def _roll_arrays(num_die_sides, num_dice, num_faces):
+    """
+    Return the face-count vectors of rolling num_dice dice as an
+    array with num_faces + 1 columns indexed by face value, and the
+    array of their multiplicities
+    """
+    import numpy
+    key = (num_die_sides, num_dice, num_faces)
+    if key not in _ROLL_ARRAYS:
+        vectors = gen_count_vectors(num_die_sides, num_dice)
+        rolls = numpy.zeros((len(vectors), num_faces + 1), dtype=int)
+        rolls[:, 1:num_die_sides + 1] = [counts for counts, dummy_weight in vectors]
+        weights = numpy.array([weight for dummy_counts, weight in vectors])
+        _ROLL_ARRAYS[key] = (rolls, weights)
+    return _ROLL_ARRAYS[key]
+
+def expected_value_batch(holds, num_die_sides, hand_size):
+    """
+    Compute expected_value for many holds in one vectorized pass.
+    Each hold rolls hand_size - len(hold) dice, and the results equal
+    those of expected_value exactly.
+
+    holds: sequence of held dice tuples
+    num_die_sides: number of sides on each die
+    hand_size: number of dice in a full hand
+
+    Returns a NumPy array of expected values in the order of holds
+    """
+    import numpy
+    holds = list(holds)
+    num_faces = max([num_die_sides] + [max(hold) for hold in holds if hold])
+    hold_counts = numpy.zeros((len(holds), num_faces + 1), dtype=int)
+    for row in range(len(holds)):
+        for die in holds[row]:
+            hold_counts[row, die] += 1
+    free_dice = numpy.array([hand_size - len(hold) for hold in holds])
+
+    rows = []
+    rolls = []
+    weights = []
+    for num_free in set(free_dice):
+        hold_rows = numpy.flatnonzero(free_dice == num_free)
+        free_rolls, free_weights = _roll_arrays(num_die_sides, num_free, num_faces)
+        rows.append(numpy.repeat(hold_rows, len(free_rolls)))
+        rolls.append(numpy.tile(free_rolls, (len(hold_rows), 1)))
+        weights.append(numpy.tile(free_weights, len(hold_rows)))
+    rows = numpy.concatenate(rows)
+    hands = hold_counts[rows] + numpy.concatenate(rolls)
+    scores = (hands * numpy.arange(num_faces + 1)).max(axis=1)
+    totals = numpy.bincount(rows, weights=scores * numpy.concatenate(weights),
+                            minlength=len(holds))
+    return totals / numpy.power(float(num_die_sides), free_dice)
+
+def strategy_batch(hand, num_die_sides):
+    """
+    Compute strategy(hand, num_die_sides) with every hold evaluated
+    in a single vectorized pass
+
+    Returns a tuple where the first element is the expected score and
+    the second element is a tuple of the dice to hold
+    """
+    all_hold = list(gen_all_holds(hand))
+    values = expected_value_batch(all_hold, num_die_sides, len(hand))
+    best = int(values.argmax())
+    if values[best] > 0.0:
+        return (float(values[best]), all_hold[best])
+    return (0.0, ())
+
+
+# Enumerators compared by run_memory_benchmark, with their count-only
+# fast paths and the outcomes they enumerate
+_ENUMERATORS = (("sequences", gen_all_sequences, iter_sequences, count_sequences,
+                 (1, 2, 3, 4)),
+                ("combinations", gen_all_combinations, iter_combinations,
+                 count_combinations, (1, 1, 2, 2, 3, 3, 4, 4, 5, 5)))
+
+def _enumeration_peak(task):
+    """
+    Count the sequences of an enumerator in this process.
+
+    task: tuple (enumerator, outcomes, length)
+
+    Returns a tuple with the count, the time taken and the growth of
+    peak resident memory in kilobytes
+    """
+    # Imported here since CodeSkulptor has no resource module
+    import resource
+    enumerator, outcomes, length = task
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    count = 0
+    for dummy_sequence in enumerator(outcomes, length):
+        count += 1
+    elapsed = time.time() - start
+    return count, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+
+def run_memory_benchmark(lengths = range(5, 11)):
+    """
+    Print the time and peak memory growth of the set and generator
+    enumerators, each run in a fresh process, and the time of the
+    count-only fast paths, for sequence lengths in lengths
+    """
+    # Imported here since CodeSkulptor has no multiprocessing
+    import multiprocessing
+    for name, materialize, stream, count_only, outcomes in _ENUMERATORS:
+        for length in lengths:
+            line = "%-12s %2d" % (name, length)
+            for enumerator in (materialize, stream):
+                pool = multiprocessing.Pool(1)
+                count, elapsed, peak = pool.apply(_enumeration_peak,
+                                                  ((enumerator, outcomes, length),))
+                pool.close()
+                pool.join()
+                line += "  %-20s %9.3f s %8d KB" % (enumerator.__name__, elapsed, peak)
+            start = time.time()
+            total = count_only(outcomes, length)
+            assert total == count
+            line += "  %8d sequences, counted in %.3f ms" % (total, 1000.0 * (time.time() - start))
+            print line
+
+
 def run_example():
     """
     Compute the dice to hold and expected score for an example hand
@@ -141,7 +790,8 @@ def run_example():
     #print "Best strategy for hand", hand, "is to hold", hold, "with expected score", hand_score
     print expected_value((2, 2), 6, 2)
     
-run_example()
+#run_example()
+#run_memory_benchmark()
 
 
 #import poc_holds_testsuite
@@ -0,0 +1,233 @@
+"""
+Vectorized 2048 boards stepping many games in lockstep
+The tiles of all games are one (games, height, width) NumPy array.
+Moves follow merge and TwentyFortyEight.move, and new tiles follow
+TwentyFortyEight.new_tile, drawn for all games at once from a seeded
+generator.
+"""
+
+import importlib
+import random
+import time
+import numpy
+
+# 2048.py cannot be imported with an import statement
+TFE = importlib.import_module("2048")
+
+DIRECTIONS = (TFE.UP, TFE.DOWN, TFE.LEFT, TFE.RIGHT)
+NO_MOVE = 0   # Direction for games that do not move
+
+def oriented(grid, direction):
+    """
+    Return a view of a (games, height, width) grid in which the tiles
+    of each line move towards index 0 of the last axis
+    """
+    if direction == TFE.LEFT:
+        return grid
+    if direction == TFE.RIGHT:
+        return grid[:, :, ::-1]
+    if direction == TFE.UP:
+        return grid.transpose(0, 2, 1)
+    return grid.transpose(0, 2, 1)[:, :, ::-1]
+
+def compress(lines):
+    """
+    Return the lines of a 2-D array with their nonzero tiles moved to
+    the front, keeping their order
+    """
+    order = numpy.argsort(lines == 0, axis = 1, kind = "mergesort")
+    return numpy.take_along_axis(lines, order, axis = 1)
+
+def merge_lines(lines):
+    """
+    Vectorized merge of every row of a 2-D array: compress, merge
+    equal neighbours from the front, each tile at most once, and
+    compress again
+    """
+    lines = compress(lines)
+    for pos in range(lines.shape[1] - 1):
+        equal = (lines[:, pos] == lines[:, pos + 1]) & (lines[:, pos] != 0)
+        lines[equal, pos] *= 2
+        lines[equal, pos + 1] = 0
+    return compress(lines)
+
+
+class BatchTwentyFortyEight:
+    """
+    Many games of 2048 on boards of the same size
+    """
+
+    def __init__(self, games, grid_height, grid_width, seed = None):
+        """
+        Create games empty boards, with new tiles drawn from a
+        generator seeded with seed
+        """
+        self.games = games
+        self.grid_height = grid_height
+        self.grid_width = grid_width
+        self.rng = numpy.random.RandomState(seed)
+        self.reset()
+
+    def reset(self):
+        """
+        Reset every game so its grid is empty.
+        """
+        self.grid = numpy.zeros((self.games, self.grid_height, self.grid_width),
+                                dtype = numpy.int64)
+
+    def get_tile(self, game, row, col):
+        """
+        Return the value of the tile at position row, col of a game.
+        """
+        return int(self.grid[game, row, col])
+
+    def set_tile(self, game, row, col, value):
+        """
+        Set the tile at position row, col of a game to have the given
+        value.
+        """
+        self.grid[game, row, col] = value
+
+    def slide(self, directions):
+        """
+        Move all tiles of each game in its direction from directions,
+        or not at all for NO_MOVE, without adding new tiles.  Games are
+        grouped by direction and each group is merged in one pass.
+
+        Returns a boolean array of the games whose grid changed
+        """
+        directions = numpy.asarray(directions)
+        before = self.grid.copy()
+        for direction in DIRECTIONS:
+            games = numpy.flatnonzero(directions == direction)
+            if not len(games):
+                continue
+            block = self.grid[games]
+            view = oriented(block, direction)
+            shape = view.shape
+            view[...] = merge_lines(view.reshape(-1, shape[2])).reshape(shape)
+            self.grid[games] = block
+        return (self.grid != before).reshape(self.games, -1).any(axis = 1)
+
+    def new_tiles(self, games = None):
+        """
+        Create a new tile in a randomly selected empty square of each
+        game in the boolean array games, default all games, that has
+        one.  The tile is 2 90% of the time and 4 10% of the time.
+        """
+        empty = (self.grid == 0).reshape(self.games, -1)
+        counts = empty.sum(axis = 1)
+        picks = (self.rng.random_sample(self.games) * counts).astype(numpy.int64)
+        fours = self.rng.random_sample(self.games) >= 0.9
+        spawn = counts > 0
+        if games is not None:
+            spawn &= games
+        # The square of each game is its picks-th empty square
+        squares = (numpy.cumsum(empty, axis = 1) > picks[:, None]).argmax(axis = 1)
+        rows = numpy.flatnonzero(spawn)
+        flat = self.grid.reshape(self.games, -1)
+        flat[rows, squares[rows]] = numpy.where(fours[rows], 4, 2)
+
+    def move(self, directions):
+        """
+        Move the tiles of each game in its direction and add a new
+        tile to every game that took a direction, like
+        TwentyFortyEight.move.
+
+        Returns a boolean array of the games whose tiles moved
+        """
+        moved = self.slide(directions)
+        self.new_tiles(numpy.asarray(directions) != NO_MOVE)
+        return moved
+
+    def game_over(self):
+        """
+        Return a boolean array of the games with no empty square and
+        no two equal neighbouring tiles
+        """
+        grid = self.grid
+        full = (grid != 0).reshape(self.games, -1).all(axis = 1)
+        across = (grid[:, :, 1:] == grid[:, :, :-1]).reshape(self.games, -1).any(axis = 1)
+        down = (grid[:, 1:, :] == grid[:, :-1, :]).reshape(self.games, -1).any(axis = 1)
+        return full & ~across & ~down
+
+    def max_tiles(self):
+        """
+        Return the largest tile of each game
+        """
+        return self.grid.reshape(self.games, -1).max(axis = 1)
+
+def cross_check(games = 200, steps = 50, grid_height = 4, grid_width = 4, seed = 0):
+    """
+    Play random directions on a batch and on one TwentyFortyEight per
+    game from the same grids.  Each step the scalar games move without
+    new tiles, then copy the tiles the batch added.
+
+    Returns the number of game steps whose grids differed after the
+    move
+    """
+    rng = random.Random(seed)
+    batch = BatchTwentyFortyEight(games, grid_height, grid_width, seed)
+    scalars = []
+    for game in range(games):
+        scalar = TFE.TwentyFortyEight(grid_height, grid_width, False)
+        scalar.new_tile = lambda: None
+        for row in range(grid_height):
+            for col in range(grid_width):
+                value = rng.choice([0, 0, 2, 2, 4, 8, 16])
+                scalar.set_tile(row, col, value)
+                batch.set_tile(game, row, col, value)
+        scalars.append(scalar)
+
+    mismatches = 0
+    for dummy_step in range(steps):
+        directions = [rng.choice(DIRECTIONS) for dummy_game in range(games)]
+        batch.slide(directions)
+        for game in range(games):
+            scalar = scalars[game]
+            scalar.move(directions[game])
+            if scalar.grid_values != batch.grid[game].tolist():
+                mismatches += 1
+        batch.new_tiles()
+        for game in range(games):
+            for row in range(grid_height):
+                for col in range(grid_width):
+                    scalars[game].set_tile(row, col, batch.get_tile(game, row, col))
+    return mismatches
+
+def run_benchmark(games = (1, 100, 1000, 10000), steps = 100, grid_height = 4,
+                  grid_width = 4, seed = 0):
+    """
+    Print the cross check result and the game steps per second of
+    random play on batches of games, and of TwentyFortyEight with
+    new tiles
+    """
+    print "cross check mismatches:", cross_check(grid_height = grid_height,
+                                                 grid_width = grid_width, seed = seed)
+    for num_games in games:
+        batch = BatchTwentyFortyEight(num_games, grid_height, grid_width, seed)
+        batch.new_tiles()
+        batch.new_tiles()
+        start = time.time()
+        for dummy_step in range(steps):
+            directions = batch.rng.randint(1, 5, num_games)
+            directions[batch.game_over()] = NO_MOVE
+            batch.move(directions)
+        elapsed = time.time() - start
+        print "batch of %5d games: %10.0f game steps/s  mean max tile %6.1f" % (
+            num_games, num_games * steps / elapsed, batch.max_tiles().mean())
+
+    random.seed(seed)
+    scalar = TFE.TwentyFortyEight(grid_height, grid_width, False)
+    scalar.new_tile()
+    scalar.new_tile()
+    start = time.time()
+    for dummy_step in range(steps * 10):
+        if scalar.is_game_over():
+            scalar.reset()
+            scalar.new_tile()
+        scalar.move(random.choice(DIRECTIONS))
+    elapsed = time.time() - start
+    print "TwentyFortyEight:     %10.0f game steps/s" % (steps * 10 / elapsed)
+
+#run_benchmark()
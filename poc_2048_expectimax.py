@@ -0,0 +1,285 @@
+"""
+Expectimax player for 2048 on packed 4x4 boards
+Max nodes try the four directions, chance nodes place a 2 (90%) or a
+4 (10%) on every empty square, as TwentyFortyEight.new_tile does.
+Search stops at a depth limit or once the probability of reaching a
+node falls below a cutoff, and chance nodes are cached on the board.
+"""
+
+import importlib
+import random
+import time
+
+# 2048.py cannot be imported with an import statement
+TFE = importlib.import_module("2048")
+
+DIRECTIONS = (TFE.UP, TFE.DOWN, TFE.LEFT, TFE.RIGHT)
+
+# Search settings
+DEPTH = 2             # Moves searched ahead
+PROB_CUTOFF = 0.0001  # Chance nodes less likely than this are evaluated
+
+# Heuristic weights, per row and column of exponents
+LOST_PENALTY = 200000.0
+EMPTY_WEIGHT = 270.0
+MERGE_WEIGHT = 700.0
+MONOTONIC_WEIGHT = 47.0
+MONOTONIC_POWER = 4.0
+SUM_WEIGHT = 11.0
+SUM_POWER = 3.5
+
+# Heuristic value of every packed row, filled on first use
+ROW_HEURISTIC = []
+
+def row_heuristic(exponents):
+    """
+    Score a row or column of tile exponents: empty squares and
+    possible merges are rewarded, and large tiles and tiles that are
+    not in increasing or decreasing order are penalized
+    """
+    empty = 0
+    merges = 0
+    previous = 0
+    counter = 0
+    for exponent in exponents:
+        if exponent == 0:
+            empty += 1
+        elif exponent == previous:
+            counter += 1
+        else:
+            if counter > 0:
+                merges += 1 + counter
+            previous = exponent
+            counter = 0
+    if counter > 0:
+        merges += 1 + counter
+
+    monotonic_left = 0.0
+    monotonic_right = 0.0
+    for index in range(1, len(exponents)):
+        before = exponents[index - 1] ** MONOTONIC_POWER
+        after = exponents[index] ** MONOTONIC_POWER
+        if exponents[index - 1] > exponents[index]:
+            monotonic_left += before - after
+        else:
+            monotonic_right += after - before
+    tile_sum = sum([exponent ** SUM_POWER for exponent in exponents])
+    return (LOST_PENALTY + EMPTY_WEIGHT * empty + MERGE_WEIGHT * merges -
+            MONOTONIC_WEIGHT * min(monotonic_left, monotonic_right) -
+            SUM_WEIGHT * tile_sum)
+
+def heuristic_table():
+    """
+    Fill ROW_HEURISTIC on first use
+    """
+    if ROW_HEURISTIC:
+        return
+    for row in range(TFE.ROW_MASK + 1):
+        ROW_HEURISTIC.append(row_heuristic([(row >> (4 * col)) & 0xF
+                                            for col in range(TFE.PACKED_SIZE)]))
+
+def evaluate(board):
+    """
+    Heuristic value of a packed board: the sum of the row heuristic
+    over its rows and its columns
+    """
+    transposed = TFE.transpose_board(board)
+    return (ROW_HEURISTIC[board & 0xFFFF] +
+            ROW_HEURISTIC[(board >> 16) & 0xFFFF] +
+            ROW_HEURISTIC[(board >> 32) & 0xFFFF] +
+            ROW_HEURISTIC[(board >> 48) & 0xFFFF] +
+            ROW_HEURISTIC[transposed & 0xFFFF] +
+            ROW_HEURISTIC[(transposed >> 16) & 0xFFFF] +
+            ROW_HEURISTIC[(transposed >> 32) & 0xFFFF] +
+            ROW_HEURISTIC[(transposed >> 48) & 0xFFFF])
+
+def board_of(game):
+    """
+    Return the packed board of a 4x4 game object
+    """
+    board = 0
+    for row in range(TFE.PACKED_SIZE):
+        for col in range(TFE.PACKED_SIZE):
+            exponent = TFE.tile_exponent(game.get_tile(row, col))
+            board |= exponent << (4 * (TFE.PACKED_SIZE * row + col))
+    return board
+
+def max_tile(board):
+    """
+    Return the largest tile value of a packed board
+    """
+    exponent = max([(board >> (4 * index)) & 0xF for index in range(16)])
+    if exponent:
+        return 1 << exponent
+    return 0
+
+def board_tiles(board):
+    """
+    Return the tile values of a packed board
+    """
+    tiles = []
+    for index in range(16):
+        exponent = (board >> (4 * index)) & 0xF
+        if exponent:
+            tiles.append(1 << exponent)
+    return tiles
+
+
+class ExpectimaxPlayer:
+    """
+    Expectimax search with a transposition cache of chance nodes,
+    cleared before every move
+    """
+
+    def __init__(self, depth = DEPTH, prob_cutoff = PROB_CUTOFF):
+        """
+        Create a player searching depth moves ahead
+        """
+        TFE.row_tables()
+        heuristic_table()
+        self._depth = depth
+        self._prob_cutoff = prob_cutoff
+        self._cache = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        Zero the search counters
+        """
+        self._moves = 0
+        self._nodes = 0
+        self._cache_hits = 0
+        self._seconds = 0.0
+
+    def stats(self):
+        """
+        Return a dictionary of search counters
+        """
+        if self._seconds > 0:
+            moves_per_second = self._moves / self._seconds
+        else:
+            moves_per_second = 0.0
+        return {"moves": self._moves,
+                "nodes": self._nodes,
+                "cache_hits": self._cache_hits,
+                "seconds": self._seconds,
+                "moves_per_second": moves_per_second}
+
+    def _chance_value(self, board, depth, prob):
+        """
+        Expected value of a board before a new tile is placed
+        """
+        if depth == 0 or prob < self._prob_cutoff:
+            return evaluate(board)
+        cached = self._cache.get(board)
+        if cached is not None and cached[0] >= depth:
+            self._cache_hits += 1
+            return cached[1]
+        self._nodes += 1
+        empty = TFE.empty_squares(board)
+        share = prob / len(empty)
+        total = 0.0
+        for index in empty:
+            shift = 4 * index
+            total += 0.9 * self._max_value(board | (1 << shift), depth, share * 0.9)
+            total += 0.1 * self._max_value(board | (2 << shift), depth, share * 0.1)
+        value = total / len(empty)
+        self._cache[board] = (depth, value)
+        return value
+
+    def _max_value(self, board, depth, prob):
+        """
+        Value of the best move from a board, 0 if no move is possible
+        """
+        self._nodes += 1
+        best = 0.0
+        for direction in DIRECTIONS:
+            moved = TFE.move_board(board, direction)
+            if moved != board:
+                best = max(best, self._chance_value(moved, depth - 1, prob))
+        return best
+
+    def best_move(self, board):
+        """
+        Return the direction with the highest expected value from a
+        packed board, or None if no move changes the board
+        """
+        start = time.time()
+        self._cache.clear()
+        best_value = None
+        best_direction = None
+        for direction in DIRECTIONS:
+            moved = TFE.move_board(board, direction)
+            if moved == board:
+                continue
+            value = self._chance_value(moved, self._depth - 1, 1.0)
+            if best_value is None or value > best_value:
+                best_value = value
+                best_direction = direction
+        self._moves += 1
+        self._seconds += time.time() - start
+        return best_direction
+
+    def __call__(self, game):
+        """
+        Return the best move of a 4x4 game object
+        """
+        if game.get_grid_height() != TFE.PACKED_SIZE or game.get_grid_width() != TFE.PACKED_SIZE:
+            raise ValueError("expectimax plays %dx%d boards only" % (TFE.PACKED_SIZE, TFE.PACKED_SIZE))
+        if isinstance(game, TFE.PackedTwentyFortyEight):
+            return self.best_move(game.board)
+        return self.best_move(board_of(game))
+
+def spawn_tile(board, rng):
+    """
+    Place a 2 (90%) or a 4 (10%) on a random empty square of a packed
+    board
+
+    Returns the new board and whether a 4 was placed
+    """
+    index = rng.choice(TFE.empty_squares(board))
+    if rng.random() < 0.9:
+        return board | (1 << (4 * index)), False
+    return board | (2 << (4 * index)), True
+
+def play_game(player, seed, max_moves = None):
+    """
+    Play a game on a packed board from two random tiles until no move
+    is possible or max_moves moves are made
+
+    Returns a tuple with the score, the largest tile and the number
+    of moves
+    """
+    rng = random.Random(seed)
+    board, four = spawn_tile(0, rng)
+    fours = int(four)
+    board, four = spawn_tile(board, rng)
+    fours += int(four)
+    moves = 0
+    while max_moves is None or moves < max_moves:
+        direction = player.best_move(board)
+        if direction is None:
+            break
+        board, four = spawn_tile(TFE.move_board(board, direction), rng)
+        fours += int(four)
+        moves += 1
+    return TFE.game_score(board_tiles(board), fours), max_tile(board), moves
+
+def run_report(games = 5, depths = (1, 2), seed = 0, max_moves = None):
+    """
+    Print the moves per second, average score and average and best
+    largest tile of the player over the same seeded games at each
+    depth
+    """
+    for depth in depths:
+        player = ExpectimaxPlayer(depth)
+        results = [play_game(player, seed + game, max_moves) for game in range(games)]
+        stats = player.stats()
+        tiles = [tile for dummy_score, tile, dummy_moves in results]
+        print "depth %d: %7.1f moves/s  avg score %8.1f  avg max tile %7.1f  best %5d  cache hits %5.1f%%" % (
+            depth, stats["moves_per_second"],
+            sum([score for score, dummy_tile, dummy_moves in results]) / float(games),
+            sum(tiles) / float(games), max(tiles),
+            100.0 * stats["cache_hits"] / max(1, stats["cache_hits"] + stats["nodes"]))
+
+#run_report()
@@ -0,0 +1,215 @@
+"""
+Headless batch simulator for 2048
+Plays seeded games of TwentyFortyEight, or PackedTwentyFortyEight on
+4x4 boards, with a policy chosen by name, sharded across a pool of
+worker processes.  Games are created with verbose off so that nothing
+is printed.
+"""
+
+import importlib
+import random
+import time
+import poc_pool
+
+# 2048.py cannot be imported with an import statement
+TFE = importlib.import_module("2048")
+
+DIRECTIONS = (TFE.UP, TFE.DOWN, TFE.LEFT, TFE.RIGHT)
+
+# Default simulation settings
+SIM_WORKERS = None  # Number of worker processes, None for one per core
+SIM_SHARD = 50      # Number of games per shard
+PERCENTILES = (5, 25, 50, 75, 95)
+
+def make_random(seed):
+    """
+    Policy that plays a uniformly random legal move
+    """
+    rng = random.Random(seed)
+    def random_policy(dummy_game, legal):
+        """
+        Random move policy
+        """
+        return rng.choice(legal)
+    return random_policy
+
+def make_expectimax(dummy_seed):
+    """
+    Policy that plays the move of an ExpectimaxPlayer, 4x4 boards only
+    """
+    import poc_2048_expectimax
+    player = poc_2048_expectimax.ExpectimaxPlayer()
+    def expectimax_policy(game, dummy_legal):
+        """
+        Expectimax move policy
+        """
+        return player(game)
+    return expectimax_policy
+
+# Policy factories by name, each taking a seed and returning a
+# function policy(game, legal_directions) -> direction
+POLICIES = {"random": make_random,
+            "expectimax": make_expectimax}
+
+def line_starts(game, direction):
+    """
+    Return the squares at which the lines moved in direction start,
+    as TwentyFortyEight.move walks them
+    """
+    height = game.get_grid_height()
+    width = game.get_grid_width()
+    if direction == TFE.UP:
+        return [(0, col) for col in range(width)], height
+    if direction == TFE.DOWN:
+        return [(height - 1, col) for col in range(width)], height
+    if direction == TFE.LEFT:
+        return [(row, 0) for row in range(height)], width
+    return [(row, width - 1) for row in range(height)], width
+
+def legal_moves(game):
+    """
+    Return the directions in which a move would change the board,
+    found by running merge on every line, or with the lookup tables
+    for packed boards
+    """
+    if isinstance(game, TFE.PackedTwentyFortyEight):
+        return [direction for direction in DIRECTIONS
+                if TFE.move_board(game.board, direction) != game.board]
+    legal = []
+    for direction in DIRECTIONS:
+        offset = TFE.OFFSETS[direction]
+        starts, length = line_starts(game, direction)
+        for row, col in starts:
+            line = [game.get_tile(row + step * offset[0], col + step * offset[1])
+                    for step in range(length)]
+            if TFE.merge(list(line)) != line:
+                legal.append(direction)
+                break
+    return legal
+
+def tile_total(game):
+    """
+    Return the sum of all tiles of a game
+    """
+    return sum([game.get_tile(row, col) for row in range(game.get_grid_height())
+                for col in range(game.get_grid_width())])
+
+def play_game(policy, height, width, packed, seed, max_moves = None):
+    """
+    Play one game from two random tiles until no move is possible or
+    max_moves moves are made.  The module level random generator,
+    which new_tile draws from, is seeded with seed.
+
+    Returns a tuple with the score, the largest tile and the number
+    of moves
+    """
+    random.seed(seed)
+    if packed:
+        game = TFE.PackedTwentyFortyEight(height, width, False)
+    else:
+        game = TFE.TwentyFortyEight(height, width, False)
+    game.reset()
+    game.new_tile()
+    game.new_tile()
+    total = tile_total(game)
+    fours = (total - 4) // 2
+    moves = 0
+    while max_moves is None or moves < max_moves:
+        legal = legal_moves(game)
+        if not legal:
+            break
+        game.move(policy(game, legal))
+        new_total = tile_total(game)
+        # Merges keep the tile total, so it grows by the new tile
+        if new_total - total == 4:
+            fours += 1
+        total = new_total
+        moves += 1
+    tiles = [game.get_tile(row, col) for row in range(height) for col in range(width)]
+    return TFE.game_score(tiles, fours), max(tiles), moves
+
+def sim_shard(task):
+    """
+    Play one shard of games, each seeded from the shard seed.
+
+    task: tuple (policy_name, games, height, width, packed, max_moves, seed)
+
+    Returns a list of (score, largest tile, moves) tuples
+    """
+    policy_name, games, height, width, packed, max_moves, seed = task
+    rng = random.Random(seed)
+    results = []
+    for dummy_game in range(games):
+        policy = POLICIES[policy_name](rng.getrandbits(32))
+        results.append(play_game(policy, height, width, packed,
+                                 rng.getrandbits(32), max_moves))
+    return results
+
+def simulate(policy_name = "random", games = 1000, height = 4, width = 4, packed = False,
+             max_moves = None, workers = SIM_WORKERS, seed = None):
+    """
+    Play games split into shards of SIM_SHARD games, see
+    poc_pool.shards, across a pool of workers.
+
+    Returns a list of (score, largest tile, moves) tuples, one per game
+    """
+    if policy_name == "expectimax" and (height, width) != (TFE.PACKED_SIZE, TFE.PACKED_SIZE):
+        raise ValueError("the expectimax policy plays %dx%d boards only"
+                         % (TFE.PACKED_SIZE, TFE.PACKED_SIZE))
+    tasks = [(policy_name, size, height, width, packed, max_moves, shard_seed)
+             for size, shard_seed in poc_pool.shards(games, SIM_SHARD, seed)]
+    results = []
+    for shard in poc_pool.run_shards(sim_shard, tasks, workers):
+        results.extend(shard)
+    return results
+
+def distribution_summary(values):
+    """
+    Return a dictionary with the mean, minimum, maximum and
+    PERCENTILES of a list of numbers
+    """
+    ordered = sorted(values)
+    summary = {"mean": sum(ordered) / float(len(ordered)),
+               "min": ordered[0], "max": ordered[-1]}
+    for percent in PERCENTILES:
+        summary["p%d" % percent] = ordered[int(round(percent / 100.0 * (len(ordered) - 1)))]
+    return summary
+
+def summarize(results):
+    """
+    Return the score and game length distribution summaries and the
+    count of games by largest tile of simulate results
+    """
+    tiles = {}
+    for dummy_score, tile, dummy_moves in results:
+        tiles[tile] = tiles.get(tile, 0) + 1
+    return {"games": len(results),
+            "score": distribution_summary([score for score, dummy_tile, dummy_moves in results]),
+            "moves": distribution_summary([moves for dummy_score, dummy_tile, moves in results]),
+            "max_tile": tiles}
+
+def run_report(runs = (("random", 2000, 4, 4, False), ("random", 2000, 4, 4, True),
+                       ("random", 200, 5, 5, False), ("expectimax", 4, 4, 4, True)),
+               workers = SIM_WORKERS, seed = 0):
+    """
+    Print the throughput and result distributions of runs of
+    (policy name, games, height, width, packed)
+    """
+    try:
+        for policy_name, games, height, width, packed in runs:
+            if workers != 1:
+                poc_pool.get_pool(workers)
+            start = time.time()
+            results = simulate(policy_name, games, height, width, packed,
+                               workers = workers, seed = seed)
+            elapsed = time.time() - start
+            summary = summarize(results)
+            tiles = ", ".join(["%d: %d" % (tile, count)
+                               for tile, count in sorted(summary["max_tile"].items())])
+            print "%-10s %2dx%-2d packed %-5s %8.1f games/s  score p50 %7d  mean %9.1f  moves p50 %5d  max tiles {%s}" % (
+                policy_name, height, width, packed, games / elapsed, summary["score"]["p50"],
+                summary["score"]["mean"], summary["moves"]["p50"], tiles)
+    finally:
+        poc_pool.close_pools()
+
+#run_report()
@@ -0,0 +1,161 @@
+"""
+Generalized dice planner for any number of dice and die sides
+Score distributions are built by convolving the dice over one face at
+a time instead of enumerating rolls.  A score is given as a fold over
+the face counts of the final hand, step(acc, face, count) -> acc,
+starting from initial and mapped to a number by finish.  Only the
+distinct accumulator values are kept, so e.g. the upper section score
+of 20 twenty-sided dice needs a few thousand states.
+"""
+
+import time
+import Yahtzee
+
+def upper_step(acc, face, count):
+    """
+    Fold step of the upper section score: the best face times count
+    """
+    return max(acc, face * count)
+
+def sum_step(acc, face, count):
+    """
+    Fold step of the sum of all dice, e.g. chance
+    """
+    return acc + face * count
+
+def kind_step(acc, dummy_face, count):
+    """
+    Fold step of the largest number of dice showing the same face
+    """
+    return max(acc, count)
+
+def vector_step(acc, dummy_face, count):
+    """
+    Fold step that keeps the whole face-count vector, for score
+    functions that cannot be folded; finish then receives the tuple
+    of counts of faces 1, 2, ...  The number of states is that of
+    full enumeration of sorted rolls.
+    """
+    return acc + (count,)
+
+def _binomial_row(num):
+    """
+    Return the binomial coefficients num choose 0..num
+    """
+    row = [1]
+    for idx in range(num):
+        row.append(row[-1] * (num - idx) // (idx + 1))
+    return row
+
+def fold_weights(held_dice, num_die_sides, num_free_dice,
+                 step = upper_step, initial = 0):
+    """
+    Convolve num_free_dice rolled dice with the held dice one face at
+    a time.  After face f the states are (dice still to place,
+    accumulator over faces 1..f) with the number of ordered rolls
+    leading to each.
+
+    Returns a dictionary mapping each final accumulator to its number
+    of ordered rolls, out of num_die_sides ** num_free_dice
+    """
+    num_faces = max([num_die_sides] + list(held_dice))
+    held_counts = [0] * (num_faces + 1)
+    for die in held_dice:
+        held_counts[die] += 1
+    binomials = [_binomial_row(num) for num in range(num_free_dice + 1)]
+
+    states = {(num_free_dice, initial): 1}
+    for face in range(1, num_faces + 1):
+        last_face = face == num_die_sides
+        new_states = {}
+        for (remaining, acc), weight in states.items():
+            if last_face:
+                choices = [remaining]
+            elif face > num_die_sides:
+                choices = [0]
+            else:
+                choices = range(remaining + 1)
+            for count in choices:
+                key = (remaining - count, step(acc, face, held_counts[face] + count))
+                new_states[key] = new_states.get(key, 0) + weight * binomials[remaining][count]
+        states = new_states
+
+    weights = {}
+    for (dummy_remaining, acc), weight in states.items():
+        weights[acc] = weights.get(acc, 0) + weight
+    return weights
+
+def score_distribution(held_dice, num_die_sides, num_free_dice,
+                       step = upper_step, initial = 0, finish = None):
+    """
+    Compute the probability distribution of the score of the held
+    dice once num_free_dice dice with num_die_sides sides are rolled.
+    The score is finish(acc) of the fold, or acc itself if finish is
+    None.
+
+    Returns a dictionary mapping each score to its probability
+    """
+    weights = fold_weights(held_dice, num_die_sides, num_free_dice, step, initial)
+    total = float(num_die_sides ** num_free_dice)
+    distribution = {}
+    for acc, weight in weights.items():
+        if finish is not None:
+            acc = finish(acc)
+        distribution[acc] = distribution.get(acc, 0.0) + weight / total
+    return distribution
+
+def expected_value(held_dice, num_die_sides, num_free_dice,
+                   step = upper_step, initial = 0, finish = None):
+    """
+    Compute the expected score of the held dice given that there are
+    num_free_dice to be rolled, each with num_die_sides.  With the
+    default fold this equals Yahtzee.expected_value.
+
+    Returns a floating point expected value
+    """
+    weights = fold_weights(held_dice, num_die_sides, num_free_dice, step, initial)
+    total_score = 0
+    for acc, weight in weights.items():
+        if finish is not None:
+            acc = finish(acc)
+        total_score += weight * acc
+    return total_score / float(num_die_sides ** num_free_dice)
+
+def strategy(hand, num_die_sides, step = upper_step, initial = 0, finish = None):
+    """
+    Compute the hold that maximizes the expected score when the
+    discarded dice are rolled
+
+    Returns a tuple where the first element is the expected score and
+    the second element is a tuple of the dice to hold
+    """
+    max_value = None
+    max_value_hold = ()
+    for hold in Yahtzee.iter_holds(hand):
+        value = expected_value(hold, num_die_sides, len(hand) - len(hold),
+                               step, initial, finish)
+        if max_value is None or value > max_value:
+            max_value = value
+            max_value_hold = hold
+    return (max_value, max_value_hold)
+
+def run_benchmark(cases = ((5, 6), (7, 6), (10, 8), (10, 10), (15, 10), (20, 20))):
+    """
+    Print the time to compute the upper section expected value of
+    rolling every die, for (number of dice, die sides) cases, next to
+    Yahtzee.expected_value where it is tractable
+    """
+    for num_dice, num_die_sides in cases:
+        start = time.time()
+        value = expected_value((), num_die_sides, num_dice)
+        elapsed = time.time() - start
+        line = "%2d d%-2d  planner %9.3f ms  ev %9.4f" % (
+            num_dice, num_die_sides, 1000.0 * elapsed, value)
+        if num_dice <= 10 and num_die_sides <= 8:
+            start = time.time()
+            reference = Yahtzee.expected_value((), num_die_sides, num_dice)
+            line += "  multiset %9.3f ms  ev %9.4f" % (
+                1000.0 * (time.time() - start), reference)
+        print line
+
+#run_benchmark()
@@ -0,0 +1,56 @@
+"""
+Seeded shards and process pools shared by the parallel simulators
+Work is split into shards of a fixed size, each with a seed drawn
+from a master seed.  The shards do not depend on the number of
+workers, so a given seed always gives the same results.  Pools are
+kept between calls until close_pools is called.
+"""
+
+import random
+
+# Process pools keyed on the number of workers
+_POOLS = {}
+
+def shards(total, shard_size, seed = None):
+    """
+    Split total units of work into shards of at most shard_size units
+
+    Returns a list of (size, seed) tuples, one per shard
+    """
+    master = random.Random(seed)
+    result = []
+    remaining = total
+    while remaining > 0:
+        size = min(shard_size, remaining)
+        result.append((size, master.getrandbits(32)))
+        remaining -= size
+    return result
+
+def get_pool(workers):
+    """
+    Return a process pool with the given number of workers, creating
+    it on first use
+    """
+    # Imported here since CodeSkulptor has no multiprocessing
+    import multiprocessing
+    if workers not in _POOLS:
+        _POOLS[workers] = multiprocessing.Pool(workers)
+    return _POOLS[workers]
+
+def close_pools():
+    """
+    Close every pool and wait for its workers to exit
+    """
+    for pool in _POOLS.values():
+        pool.close()
+        pool.join()
+    _POOLS.clear()
+
+def run_shards(function, tasks, workers):
+    """
+    Return the list of function(task) for each task, run in this
+    process if workers is 1 and on the pool of workers otherwise
+    """
+    if workers == 1:
+        return map(function, tasks)
+    return get_pool(workers).map(function, tasks)
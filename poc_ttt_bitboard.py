@@ -0,0 +1,275 @@
+"""
+Bitboard Tic-Tac-Toe board
+Drop-in replacement for poc_ttt_provided.TTTBoard that keeps the
+squares of each player in an integer bitmask
+"""
+
+import random
+import poc_ttt_provided as provided
+
+# Caches of board geometry keyed on dimension
+_GEOMETRY = {}
+
+def board_geometry(dim):
+    """
+    Compute the bitmasks of a dim x dim board.  Square (row, col) is
+    bit row * dim + col.
+
+    Returns a tuple with three elements: the mask of all squares, the
+    list of line masks (rows, columns, diagonals) and, for each
+    square, the list of line masks through it.
+    """
+    if dim in _GEOMETRY:
+        return _GEOMETRY[dim]
+    lines = []
+    for idx in range(dim):
+        lines.append([idx * dim + col for col in range(dim)])
+        lines.append([row * dim + idx for row in range(dim)])
+    lines.append([idx * dim + idx for idx in range(dim)])
+    lines.append([idx * dim + dim - idx - 1 for idx in range(dim)])
+    line_masks = []
+    cell_lines = [[] for dummy_idx in range(dim * dim)]
+    for line in lines:
+        mask = 0
+        for index in line:
+            mask |= 1 << index
+        line_masks.append(mask)
+        for index in line:
+            cell_lines[index].append(mask)
+    geometry = ((1 << (dim * dim)) - 1, line_masks, cell_lines)
+    _GEOMETRY[dim] = geometry
+    return geometry
+
+def is_reversed(board):
+    """
+    Determine whether board is a reverse game, where completing a
+    line loses, using only the public TTTBoard interface.  A clone is
+    given a completed line that no earlier line check can pre-empt
+    and the reported winner is compared with the line owner.
+    TTTBitBoards answer from their own flag.
+    """
+    if isinstance(board, TTTBitBoard):
+        return board._reverse
+    dim = board.get_dim()
+    lines = []
+    lines.extend([[(row, col) for col in range(dim)] for row in range(dim)])
+    lines.extend([[(row, col) for row in range(dim)] for col in range(dim)])
+    lines.append([(idx, idx) for idx in range(dim)])
+    lines.append([(idx, dim - idx - 1) for idx in range(dim)])
+    for line in lines:
+        owners = set([board.square(row, col) for (row, col) in line])
+        owners.discard(provided.EMPTY)
+        if len(owners) > 1:
+            continue
+        if owners:
+            player = owners.pop()
+        else:
+            player = provided.PLAYERX
+        probe = board.clone()
+        for (row, col) in line:
+            probe.move(row, col, player)
+        return probe.check_win() == provided.switch_player(player)
+    return False
+
+def from_board(board):
+    """
+    Return a TTTBitBoard with the same squares and rules as board
+    """
+    if isinstance(board, TTTBitBoard):
+        return board.clone()
+    dim = board.get_dim()
+    grid = [[board.square(row, col) for col in range(dim)]
+            for row in range(dim)]
+    return TTTBitBoard(dim, is_reversed(board), grid)
+
+
+class TTTBitBoard:
+    """
+    Tic-Tac-Toe board with one bitmask per player.  Supports the
+    TTTBoard interface plus in-place make/unmake on flat square
+    indices for search and simulation loops.
+    """
+
+    def __init__(self, dim, reverse = False, board = None):
+        """
+        Initialize the board with the given dimension and optional
+        list of lists of squares
+        """
+        self._dim = dim
+        self._reverse = reverse
+        self._full, self._lines, self._cell_lines = board_geometry(dim)
+        self._xmask = 0
+        self._omask = 0
+        if board != None:
+            for row in range(dim):
+                for col in range(dim):
+                    if board[row][col] != provided.EMPTY:
+                        self.move(row, col, board[row][col])
+
+    def __str__(self):
+        """
+        Human readable representation of the board
+        """
+        strmap = {provided.EMPTY: " ", provided.PLAYERX: "X",
+                  provided.PLAYERO: "O"}
+        rep = ""
+        for row in range(self._dim):
+            squares = [strmap[self.square(row, col)]
+                       for col in range(self._dim)]
+            rep += " | ".join(squares) + "\n"
+            if row != self._dim - 1:
+                rep += "-" * (4 * self._dim - 3) + "\n"
+        return rep
+
+    def get_dim(self):
+        """
+        Return the dimension of the board
+        """
+        return self._dim
+
+    def square(self, row, col):
+        """
+        Return the status (EMPTY, PLAYERX, PLAYERO) of square (row, col)
+        """
+        bit = 1 << (row * self._dim + col)
+        if self._xmask & bit:
+            return provided.PLAYERX
+        if self._omask & bit:
+            return provided.PLAYERO
+        return provided.EMPTY
+
+    def masks(self):
+        """
+        Return the (PLAYERX, PLAYERO) bitmasks
+        """
+        return self._xmask, self._omask
+
+    def empty_indices(self):
+        """
+        Return a list of the flat indices of the empty squares
+        """
+        free = self._full & ~(self._xmask | self._omask)
+        indices = []
+        index = 0
+        while free:
+            if free & 1:
+                indices.append(index)
+            free >>= 1
+            index += 1
+        return indices
+
+    def get_empty_squares(self):
+        """
+        Return a list of (row, col) tuples for all empty squares
+        """
+        dim = self._dim
+        return [(index // dim, index % dim) for index in self.empty_indices()]
+
+    def make_move(self, index, player):
+        """
+        Place player on the empty square with flat index
+        """
+        if player == provided.PLAYERX:
+            self._xmask |= 1 << index
+        else:
+            self._omask |= 1 << index
+
+    def unmake_move(self, index):
+        """
+        Clear the square with flat index
+        """
+        bit = ~(1 << index)
+        self._xmask &= bit
+        self._omask &= bit
+
+    def move(self, row, col, player):
+        """
+        Place player on the board at (row, col) if it is empty
+        """
+        index = row * self._dim + col
+        if not (self._xmask | self._omask) & (1 << index):
+            self.make_move(index, player)
+
+    def unmove(self, row, col):
+        """
+        Clear square (row, col), undoing a move
+        """
+        self.unmake_move(row * self._dim + col)
+
+    def completes_line(self, index, player):
+        """
+        Return True if player owns a full line through the square with
+        flat index.  Only lines through that square are checked.
+        """
+        if player == provided.PLAYERX:
+            mask = self._xmask
+        else:
+            mask = self._omask
+        for line in self._cell_lines[index]:
+            if mask & line == line:
+                return True
+        return False
+
+    def outcome(self, player):
+        """
+        Return the check_win result for a board where player owns a
+        completed line
+        """
+        if self._reverse:
+            return provided.switch_player(player)
+        return player
+
+    def check_win(self):
+        """
+        Return the winner (PLAYERX, PLAYERO), DRAW if the board is full
+        with no winner, or None if the game is still in progress
+        """
+        xmask = self._xmask
+        omask = self._omask
+        for line in self._lines:
+            if xmask & line == line:
+                return self.outcome(provided.PLAYERX)
+            if omask & line == line:
+                return self.outcome(provided.PLAYERO)
+        if xmask | omask == self._full:
+            return provided.DRAW
+        return None
+
+    def playout(self, player, rng = random):
+        """
+        Play random moves in place, starting with player, until the
+        game is over.  Only the lines through each new move are
+        checked for a win.
+        """
+        if self.check_win() != None:
+            return
+        other = provided.switch_player(player)
+        masks = {provided.PLAYERX: self._xmask, provided.PLAYERO: self._omask}
+        cell_lines = self._cell_lines
+        empty = self.empty_indices()
+        while empty:
+            pos = int(rng.random() * len(empty))
+            index = empty[pos]
+            empty[pos] = empty[-1]
+            empty.pop()
+            mask = masks[player] | (1 << index)
+            masks[player] = mask
+            won = False
+            for line in cell_lines[index]:
+                if mask & line == line:
+                    won = True
+                    break
+            if won:
+                break
+            player, other = other, player
+        self._xmask = masks[provided.PLAYERX]
+        self._omask = masks[provided.PLAYERO]
+
+    def clone(self):
+        """
+        Return a copy of the board
+        """
+        board = TTTBitBoard(self._dim, self._reverse)
+        board._xmask = self._xmask
+        board._omask = self._omask
+        return board
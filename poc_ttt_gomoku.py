@@ -0,0 +1,437 @@
+"""
+Generalized k-in-a-row Tic-Tac-Toe (Gomoku-scale boards)
+Mini-max and Monte Carlo players for large boards where k marks in a
+row, column or diagonal win
+"""
+
+import random
+import poc_ttt_provided as provided
+import poc_ttt_bitboard
+
+# Default game settings
+DIM = 15
+K = 5
+
+# SCORING VALUES, same convention as poc_tttmm
+SCORES = {provided.PLAYERX: 1,
+          provided.DRAW: 0,
+          provided.PLAYERO: -1}
+
+# Search settings
+RADIUS = 2              # Candidate moves lie this close to a stone
+DEPTH = 2               # Plies searched by mm_move
+BEAM = 10               # Candidates searched at every node
+THREAT_BASE = 8         # A window with c marks is worth THREAT_BASE ** c - 1
+THREAT_SCALE = 1000.0   # Threat total giving half of HEURISTIC_WEIGHT
+HEURISTIC_WEIGHT = 0.5  # Bound on heuristic scores, below a win
+INFINITY = 2
+
+# Caches of board geometry keyed on (dim, k)
+_GEOMETRY = {}
+
+def board_geometry(dim, k):
+    """
+    Compute the k-square windows of a dim x dim board.  Square
+    (row, col) has flat index row * dim + col.
+
+    Returns a tuple with three elements: the list of windows as tuples
+    of flat indices, for each square the list of windows through it,
+    and for each square the list of squares within RADIUS of it.
+    """
+    if (dim, k) in _GEOMETRY:
+        return _GEOMETRY[(dim, k)]
+    windows = []
+    for row in range(dim):
+        for col in range(dim):
+            for (drow, dcol) in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row = row + drow * (k - 1)
+                end_col = col + dcol * (k - 1)
+                if 0 <= end_row < dim and 0 <= end_col < dim:
+                    windows.append(tuple([(row + drow * step) * dim + col + dcol * step
+                                          for step in range(k)]))
+    cell_windows = [[] for dummy_idx in range(dim * dim)]
+    for window_id in range(len(windows)):
+        for index in windows[window_id]:
+            cell_windows[index].append(window_id)
+    neighbors = []
+    for row in range(dim):
+        for col in range(dim):
+            neighbors.append([nrow * dim + ncol
+                              for nrow in range(max(row - RADIUS, 0), min(row + RADIUS + 1, dim))
+                              for ncol in range(max(col - RADIUS, 0), min(col + RADIUS + 1, dim))
+                              if (nrow, ncol) != (row, col)])
+    geometry = (windows, cell_windows, neighbors)
+    _GEOMETRY[(dim, k)] = geometry
+    return geometry
+
+
+class KInARowBoard:
+    """
+    Tic-Tac-Toe board of any size won by k marks in a row.  Supports
+    the TTTBoard interface.  Moves update the win state, the threat
+    evaluation and the candidate moves incrementally and can be
+    undone.
+    """
+
+    def __init__(self, dim, k = K, reverse = False, board = None):
+        """
+        Initialize the board with the given dimension, winning length
+        and optional list of lists of squares
+        """
+        self._dim = dim
+        self._k = k
+        self._reverse = reverse
+        self._windows, self._cell_windows, self._neighbors = board_geometry(dim, k)
+        self._weights = [THREAT_BASE ** count - 1 for count in range(k)]
+        self._cells = [provided.EMPTY] * (dim * dim)
+        self._counts = {provided.PLAYERX: [0] * len(self._windows),
+                        provided.PLAYERO: [0] * len(self._windows)}
+        self._near = [0] * (dim * dim)
+        self._empty = range(dim * dim)
+        self._empty_pos = range(dim * dim)
+        self._threat = 0
+        self._winners = [None]
+        if board != None:
+            for row in range(dim):
+                for col in range(dim):
+                    if board[row][col] != provided.EMPTY:
+                        self.move(row, col, board[row][col])
+
+    def __str__(self):
+        """
+        Human readable representation of the board
+        """
+        strmap = {provided.EMPTY: ".", provided.PLAYERX: "X",
+                  provided.PLAYERO: "O"}
+        rep = ""
+        for row in range(self._dim):
+            rep += " ".join([strmap[self.square(row, col)]
+                             for col in range(self._dim)]) + "\n"
+        return rep
+
+    def get_dim(self):
+        """
+        Return the dimension of the board
+        """
+        return self._dim
+
+    def get_k(self):
+        """
+        Return the number of marks in a row needed to win
+        """
+        return self._k
+
+    def square(self, row, col):
+        """
+        Return the status (EMPTY, PLAYERX, PLAYERO) of square (row, col)
+        """
+        return self._cells[row * self._dim + col]
+
+    def get_empty_squares(self):
+        """
+        Return a list of (row, col) tuples for all empty squares
+        """
+        dim = self._dim
+        return [(index // dim, index % dim) for index in sorted(self._empty)]
+
+    def empty_indices(self):
+        """
+        Return a list of the flat indices of the empty squares
+        """
+        return list(self._empty)
+
+    def window_value(self, window_id):
+        """
+        Return the threat value of a window for PLAYERX
+        """
+        xcount = self._counts[provided.PLAYERX][window_id]
+        ocount = self._counts[provided.PLAYERO][window_id]
+        if ocount == 0 and xcount < self._k:
+            return self._weights[xcount]
+        if xcount == 0 and ocount < self._k:
+            return -self._weights[ocount]
+        return 0
+
+    def make_move(self, index, player):
+        """
+        Place player on the empty square with flat index, updating the
+        winner, the threat total and the candidate counts
+        """
+        self._cells[index] = player
+        pos = self._empty_pos[index]
+        last = self._empty[-1]
+        self._empty[pos] = last
+        self._empty_pos[last] = pos
+        self._empty.pop()
+        for neighbor in self._neighbors[index]:
+            self._near[neighbor] += 1
+
+        counts = self._counts[player]
+        winner = self._winners[-1]
+        for window_id in self._cell_windows[index]:
+            self._threat -= self.window_value(window_id)
+            counts[window_id] += 1
+            self._threat += self.window_value(window_id)
+            if counts[window_id] == self._k and winner == None:
+                if self._reverse:
+                    winner = provided.switch_player(player)
+                else:
+                    winner = player
+        if winner == None and not self._empty:
+            winner = provided.DRAW
+        self._winners.append(winner)
+
+    def unmake_move(self, index):
+        """
+        Clear the square with flat index, undoing the last move there
+        """
+        player = self._cells[index]
+        counts = self._counts[player]
+        for window_id in self._cell_windows[index]:
+            self._threat -= self.window_value(window_id)
+            counts[window_id] -= 1
+            self._threat += self.window_value(window_id)
+        for neighbor in self._neighbors[index]:
+            self._near[neighbor] -= 1
+        self._empty_pos[index] = len(self._empty)
+        self._empty.append(index)
+        self._cells[index] = provided.EMPTY
+        self._winners.pop()
+
+    def move(self, row, col, player):
+        """
+        Place player on the board at (row, col) if it is empty
+        """
+        index = row * self._dim + col
+        if self._cells[index] == provided.EMPTY:
+            self.make_move(index, player)
+
+    def unmove(self, row, col):
+        """
+        Clear square (row, col), undoing the last move
+        """
+        self.unmake_move(row * self._dim + col)
+
+    def check_win(self):
+        """
+        Return the winner (PLAYERX, PLAYERO), DRAW if the board is full
+        with no winner, or None if the game is still in progress.  The
+        state is kept up to date by every move, so this is O(1).
+        """
+        return self._winners[-1]
+
+    def threat(self):
+        """
+        Return the sum of the window values for PLAYERX
+        """
+        return self._threat
+
+    def evaluate(self):
+        """
+        Heuristic score of the board for PLAYERX strictly inside
+        +/- HEURISTIC_WEIGHT.  Threats count against their owner in a
+        reverse game.
+        """
+        value = HEURISTIC_WEIGHT * self._threat / (abs(self._threat) + THREAT_SCALE)
+        if self._reverse:
+            return -value
+        return value
+
+    def move_gain(self, index, player):
+        """
+        Return the change of the threat total, signed for player and
+        negated in a reverse game, if player moved on the empty square
+        with flat index
+        """
+        counts = self._counts[player]
+        other = self._counts[provided.switch_player(player)]
+        gain = 0
+        for window_id in self._cell_windows[index]:
+            if other[window_id] == 0:
+                gain += self._weights[min(counts[window_id] + 1, self._k - 1)] \
+                        - self._weights[counts[window_id]]
+                if counts[window_id] + 1 == self._k:
+                    gain += THREAT_BASE ** self._k
+            elif counts[window_id] == 0:
+                gain += self._weights[other[window_id]]
+        if self._reverse:
+            return -gain
+        return gain
+
+    def candidates(self):
+        """
+        Return the flat indices of the empty squares within RADIUS of
+        a stone, or the center square of an empty board
+        """
+        near = self._near
+        indices = [index for index in self._empty if near[index]]
+        if not indices:
+            if self._empty:
+                center = (self._dim // 2) * self._dim + self._dim // 2
+                if self._cells[center] == provided.EMPTY:
+                    return [center]
+                return [self._empty[0]]
+        return indices
+
+    def playout(self, player, rng = random):
+        """
+        Play random moves in place, starting with player, until the
+        game is over
+        """
+        while self._winners[-1] == None:
+            self.make_move(self._empty[int(rng.random() * len(self._empty))], player)
+            player = provided.switch_player(player)
+
+    def clone(self):
+        """
+        Return a copy of the board
+        """
+        board = KInARowBoard(self._dim, self._k, self._reverse)
+        board._cells = list(self._cells)
+        board._counts = {provided.PLAYERX: list(self._counts[provided.PLAYERX]),
+                         provided.PLAYERO: list(self._counts[provided.PLAYERO])}
+        board._near = list(self._near)
+        board._empty = list(self._empty)
+        board._empty_pos = list(self._empty_pos)
+        board._threat = self._threat
+        board._winners = list(self._winners)
+        return board
+
+def from_board(board, k = K):
+    """
+    Return a KInARowBoard with the squares of board.  Boards that are
+    already KInARowBoards keep their own k.
+    """
+    if isinstance(board, KInARowBoard):
+        return board.clone()
+    dim = board.get_dim()
+    grid = [[board.square(row, col) for col in range(dim)] for row in range(dim)]
+    return KInARowBoard(dim, min(k, dim), poc_ttt_bitboard.is_reversed(board), grid)
+
+def ordered_candidates(board, player):
+    """
+    Return the candidate moves of player, best first by the threat
+    they create plus the threat they block
+    """
+    other = provided.switch_player(player)
+    scored = [(board.move_gain(index, player) + board.move_gain(index, other), index)
+              for index in board.candidates()]
+    scored.sort(reverse=True)
+    return [index for (dummy_gain, index) in scored]
+
+def negamax(board, player, depth, alpha, beta):
+    """
+    Depth-limited alpha-beta search over the best BEAM candidates.
+
+    Returns a tuple with two elements.  The first element is the score
+    of board for player and the second element is the flat index of
+    the best move, or None at a leaf.
+    """
+    winner = board.check_win()
+    if winner != None:
+        return SCORES[winner] * SCORES[player], None
+    if depth == 0:
+        return board.evaluate() * SCORES[player], None
+    other = provided.switch_player(player)
+    best_value = -INFINITY
+    best_move = None
+    for index in ordered_candidates(board, player)[:BEAM]:
+        board.make_move(index, player)
+        value = -negamax(board, other, depth - 1, -beta, -alpha)[0]
+        board.unmake_move(index)
+        if value > best_value:
+            best_value = value
+            best_move = index
+        if value > alpha:
+            alpha = value
+        if alpha >= beta:
+            break
+    return best_value, best_move
+
+def mm_move(board, player):
+    """
+    Make a move on the board.
+
+    Returns a tuple with two elements.  The first element is the score
+    of the given board and the second element is the desired move as a
+    tuple, (row, col).
+    """
+    if board.check_win() != None:
+        return SCORES[board.check_win()], (-1, -1)
+    board = from_board(board)
+    value, index = negamax(board, player, DEPTH, -INFINITY, INFINITY)
+    dim = board.get_dim()
+    return value * SCORES[player], (index // dim, index % dim)
+
+def move_wrapper(board, player, dummy_trials):
+    """
+    Wrapper to allow the use of the same infrastructure that was used
+    for Monte Carlo Tic-Tac-Toe.
+    """
+    return mm_move(board, player)[1]
+
+def mc_move(board, player, trials):
+    """
+    Monte Carlo move restricted to candidate squares.  Trials are
+    spread evenly over the candidates, and each plays the candidate
+    followed by a random playout.  An immediately winning candidate is
+    played without simulating, except in a reverse game where no move
+    wins at once.
+    """
+    board = from_board(board)
+    dim = board.get_dim()
+    candidates = ordered_candidates(board, player)
+    if not board._reverse:
+        for index in candidates:
+            board.make_move(index, player)
+            winner = board.check_win()
+            board.unmake_move(index)
+            if winner == player:
+                return index // dim, index % dim
+
+    other = provided.switch_player(player)
+    totals = dict([(index, 0.0) for index in candidates])
+    runs = dict([(index, 0) for index in candidates])
+    for trial in range(max(trials, len(candidates))):
+        index = candidates[trial % len(candidates)]
+        board_clone = board.clone()
+        board_clone.make_move(index, player)
+        board_clone.playout(other)
+        winner = board_clone.check_win()
+        if winner == player:
+            totals[index] += 1
+        elif winner != provided.DRAW:
+            totals[index] -= 1
+        runs[index] += 1
+    best = max(candidates, key=lambda index: totals[index] / runs[index])
+    return best // dim, best % dim
+
+def play_game(move_x, move_o, trials, dim = DIM, k = K, reverse = False,
+              verbose = True):
+    """
+    Play a game between two move functions on a k-in-a-row board
+
+    Returns the winner, or DRAW
+    """
+    board = KInARowBoard(dim, k, reverse)
+    player = provided.PLAYERX
+    while board.check_win() == None:
+        if player == provided.PLAYERX:
+            row, col = move_x(board, player, trials)
+        else:
+            row, col = move_o(board, player, trials)
+        board.move(row, col, player)
+        player = provided.switch_player(player)
+        if verbose:
+            print board
+    winner = board.check_win()
+    if verbose:
+        if winner == provided.PLAYERX:
+            print "X wins!"
+        elif winner == provided.PLAYERO:
+            print "O wins!"
+        else:
+            print "Tie!"
+    return winner
+
+#play_game(move_wrapper, mc_move, 200)
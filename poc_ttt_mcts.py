@@ -0,0 +1,298 @@
+"""
+Monte Carlo Tree Search Tic-Tac-Toe Player
+"""
+
+import math
+import random
+import time
+import poc_ttt_gui
+import poc_ttt_provided as provided
+import poc_ttt_bitboard
+import poc_ttt_template
+
+# Constants for the tree search
+# Change as desired
+EXPLORATION = math.sqrt(2)  # UCT exploration constant
+TIME_BUDGET = None          # Seconds per move, None to use a node budget
+NODE_BUDGET = None          # Iterations per move, None to use trials
+
+# Reward for the player who moved into a node, by game outcome
+WIN = 1.0
+DRAW = 0.5
+LOSS = 0.0
+
+def random_playout(board, player, rng):
+    """
+    Playout policy that plays uniformly random moves
+    """
+    board.playout(player, rng)
+
+def greedy_playout(board, player, rng):
+    """
+    Playout policy that takes an immediate win, otherwise blocks an
+    immediate win of the opponent, otherwise plays at random
+    """
+    while board.check_win() == None:
+        other = provided.switch_player(player)
+        empty = board.empty_indices()
+        move = None
+        for target in (player, other):
+            for index in empty:
+                board.make_move(index, target)
+                completed = board.completes_line(index, target)
+                board.unmake_move(index)
+                if completed:
+                    move = index
+                    break
+            if move is not None:
+                break
+        if move is None:
+            move = rng.choice(empty)
+        board.make_move(move, player)
+        player = other
+
+
+class MCTSNode:
+    """
+    Node of the search tree.  Statistics are kept for the player who
+    made the move leading to the node.
+    """
+
+    def __init__(self, parent, move, mover, board):
+        """
+        Create the node reached by mover playing the square with flat
+        index move; board is the position after the move
+        """
+        self.parent = parent
+        self.move = move
+        self.mover = mover
+        self.to_move = provided.switch_player(mover)
+        self.masks = board.masks()
+        self.children = []
+        if board.check_win() == None:
+            self.untried = board.empty_indices()
+        else:
+            self.untried = []
+        self.visits = 0
+        self.reward = 0.0
+
+    def select_child(self, exploration):
+        """
+        Return the child with the highest UCT value
+        """
+        log_visits = math.log(self.visits)
+        best_value = float("-inf")
+        best_child = None
+        for child in self.children:
+            value = (child.reward / child.visits +
+                     exploration * math.sqrt(log_visits / child.visits))
+            if value > best_value:
+                best_value = value
+                best_child = child
+        return best_child
+
+    def count(self):
+        """
+        Return the number of nodes in the subtree
+        """
+        total = 1
+        for child in self.children:
+            total += child.count()
+        return total
+
+
+class MCTSPlayer:
+    """
+    UCT player following the (board, player, trials) contract of
+    mc_move.  The tree is kept between moves of the same game.
+    """
+
+    def __init__(self, exploration = EXPLORATION, playout = random_playout,
+                 time_budget = TIME_BUDGET, node_budget = NODE_BUDGET,
+                 seed = None):
+        """
+        Create a player.  Each move runs for time_budget seconds if
+        given, otherwise for node_budget iterations, otherwise for the
+        number of trials passed to the move function.
+        """
+        self._exploration = exploration
+        self._playout = playout
+        self._time_budget = time_budget
+        self._node_budget = node_budget
+        self._rng = random.Random(seed)
+        self._root = None
+        self._board = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        Zero the search counters
+        """
+        self._iterations = 0
+        self._reused = 0
+
+    def stats(self):
+        """
+        Return a dictionary of search counters
+        """
+        if self._root is None:
+            tree_size = 0
+        else:
+            tree_size = self._root.count()
+        return {"iterations": self._iterations,
+                "reused_visits": self._reused,
+                "tree_size": tree_size}
+
+    def find_root(self, board, player):
+        """
+        Return the node of the current tree for board with player to
+        move, looking up to two moves below the old root, or a new
+        root if the board is not in the tree.
+        """
+        masks = board.masks()
+        candidates = []
+        if self._root is not None and self._board.get_dim() == board.get_dim():
+            candidates.append(self._root)
+            for child in self._root.children:
+                candidates.append(child)
+                candidates.extend(child.children)
+        for node in candidates:
+            if node.masks == masks and node.to_move == player:
+                node.parent = None
+                self._reused += node.visits
+                return node
+        return MCTSNode(None, None, provided.switch_player(player), board)
+
+    def iterate(self):
+        """
+        Run one select, expand, simulate and backpropagate pass
+        """
+        node = self._root
+        board = self._board.clone()
+        while not node.untried and node.children:
+            node = node.select_child(self._exploration)
+            board.make_move(node.move, node.mover)
+
+        if node.untried:
+            pos = self._rng.randrange(len(node.untried))
+            move = node.untried[pos]
+            node.untried[pos] = node.untried[-1]
+            node.untried.pop()
+            board.make_move(move, node.to_move)
+            child = MCTSNode(node, move, node.to_move, board)
+            node.children.append(child)
+            node = child
+
+        if board.check_win() == None:
+            self._playout(board, node.to_move, self._rng)
+        winner = board.check_win()
+
+        while node is not None:
+            node.visits += 1
+            if winner == node.mover:
+                node.reward += WIN
+            elif winner == provided.DRAW:
+                node.reward += DRAW
+            else:
+                node.reward += LOSS
+            node = node.parent
+        self._iterations += 1
+
+    def __call__(self, board, player, trials):
+        """
+        Return the move (row, col) for player on board
+        """
+        bitboard = poc_ttt_bitboard.from_board(board)
+        self._root = self.find_root(bitboard, player)
+        self._board = bitboard
+        if self._time_budget is not None:
+            deadline = time.time() + self._time_budget
+            while True:
+                self.iterate()
+                if time.time() >= deadline:
+                    break
+        else:
+            budget = self._node_budget
+            if budget is None:
+                budget = trials
+            for dummy in range(max(budget, 1)):
+                self.iterate()
+
+        best = max(self._root.children, key=lambda child: child.visits)
+        dim = board.get_dim()
+        return best.move // dim, best.move % dim
+
+PLAYER = MCTSPlayer()
+
+def mcts_move(board, player, trials):
+    """
+    Make a move with the module level MCTS player
+    """
+    return PLAYER(board, player, trials)
+
+def play_match(move_x, move_o, dim, trials = 1):
+    """
+    Play one silent game between two move functions
+
+    Returns the winner, or DRAW
+    """
+    board = provided.TTTBoard(dim)
+    player = provided.PLAYERX
+    while board.check_win() == None:
+        if player == provided.PLAYERX:
+            row, col = move_x(board, player, trials)
+        else:
+            row, col = move_o(board, player, trials)
+        board.move(row, col, player)
+        player = provided.switch_player(player)
+    return board.check_win()
+
+def run_comparison(games = 100, seconds = 0.05, dim = 3, seed = 0,
+                   exploration = EXPLORATION, playout = random_playout):
+    """
+    Play MCTS against flat Monte Carlo with the same CPU time per move,
+    alternating sides, and print MCTS wins, draws and losses.  The
+    flat player gets as many trials as it can run in seconds.
+    """
+    rng = random.Random(seed)
+    empty = provided.TTTBoard(dim)
+    calibration = 200
+    start = time.time()
+    poc_ttt_template.mc_parallel_scores(empty, provided.PLAYERX, calibration, 1, seed)
+    flat_trials = max(1, int(calibration * seconds / (time.time() - start)))
+
+    def flat_move(board, player, trials):
+        """
+        Quiet flat Monte Carlo player
+        """
+        scores = poc_ttt_template.mc_parallel_scores(
+            board, player, trials, 1, rng.getrandbits(32))
+        return poc_ttt_template.get_best_move(board, scores)
+
+    results = {"win": 0, "draw": 0, "loss": 0}
+    for game in range(games):
+        mcts = MCTSPlayer(exploration, playout, seconds, None, rng.getrandbits(32))
+        if game % 2 == 0:
+            mcts_side = provided.PLAYERX
+            winner = play_match(mcts, flat_move, dim, flat_trials)
+        else:
+            mcts_side = provided.PLAYERO
+            winner = play_match(flat_move, mcts, dim, flat_trials)
+        if winner == mcts_side:
+            results["win"] += 1
+        elif winner == provided.DRAW:
+            results["draw"] += 1
+        else:
+            results["loss"] += 1
+    print "%dx%d, %.3f s per move (flat MC: %d trials): MCTS won %d, drew %d, lost %d" % (
+        dim, dim, seconds, flat_trials, results["win"], results["draw"], results["loss"])
+    return results
+
+# Test game with the console or the GUI.
+# Uncomment whichever you prefer.
+# Both should be commented out when you submit for
+# testing to save time.
+
+#provided.play_game(mcts_move, 1000, False)
+#poc_ttt_gui.run_gui(3, provided.PLAYERX, mcts_move, 1000, False)
+#run_comparison()
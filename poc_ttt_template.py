@@ -2,26 +2,45 @@
 Monte Carlo Tic-Tac-Toe Player
 """
 
+import math
 import random
+import time
 import poc_ttt_gui
 import poc_ttt_provided as provided
+import poc_ttt_bitboard
+import poc_pool
 
 # Constants for Monte Carlo simulator
 # Change as desired
 NTRIALS = 100    # Number of trials to run
 MCMATCH = 1.0  # Score for squares played by the machine player
 MCOTHER = 1.0  # Score for squares played by the other player
+
+# Constants for the parallel simulator
+MC_WORKERS = None  # Number of worker processes, None for one per core
+MC_SEED = None     # Master seed, None for a fresh seed every move
+MC_SHARD = 1000    # Number of trials per shard
+MC_BATCH = 4096    # Number of trials simulated at once by the NumPy engine
+
+# Constants for the adaptive simulator
+MC_CONFIDENCE = 0.95     # Confidence that the best square beats the runner-up
+MC_ADAPTIVE_BATCH = 50   # Number of trials between stopping checks
+
+# Trials spent by mc_move_adaptive
+ADAPTIVE_STATS = {"moves": 0, "trials": 0, "early_stops": 0, "last": None}
     
-def mc_trial(board, player):
+def mc_trial(board, player, rng = random):
     """
     mc_trial
     """
+    if isinstance(board, poc_ttt_bitboard.TTTBitBoard):
+        board.playout(player, rng)
+        return
     while board.check_win() == None:
         empty_squares = board.get_empty_squares()
         if len(empty_squares) == 0:
             break
-        empty_squares = board.get_empty_squares()
-        square = random.choice(empty_squares)
+        square = rng.choice(empty_squares)
         board.move(square[0],square[1],player)
         if player == provided.PLAYERX:
             player = provided.PLAYERO
@@ -75,8 +94,9 @@ def mc_move(board, player, trials):
     """
     dim = board.get_dim()
     scores = [ [0 for dummy_col in range(dim)] for dummy_row in range(dim)]
+    bitboard = poc_ttt_bitboard.from_board(board)
     for dummy in range(trials):
-        board_clone = board.clone()
+        board_clone = bitboard.clone()
         current_player = player
         mc_trial(board_clone, current_player)
         mc_update_scores(scores, board_clone, player)
@@ -85,14 +105,278 @@ def mc_move(board, player, trials):
         for dummy_j in range(dim):
             scores[dummy_i][dummy_j] = scores[dummy_i][dummy_j]/trials
     
-    print scores
+    #print scores
+    return get_best_move(board, scores)
+
+def z_score(confidence):
+    """
+    Return z such that a standard normal variable is at most z with
+    probability confidence
+    """
+    low = -10.0
+    high = 10.0
+    for dummy in range(60):
+        mid = (low + high) / 2
+        if 0.5 * (1 + math.erf(mid / math.sqrt(2))) < confidence:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+def mc_separation(sums, history):
+    """
+    Compare the two squares with the best mean score.  Both squares
+    are scored from the same trials, so the test is on the per-trial
+    difference of their scores.
+
+    sums: dictionary mapping squares to the sum of their per-trial
+    scores
+    history: list of dictionaries mapping squares to their score in
+    one trial
+
+    Returns a tuple (leader, runner_up, z) where z is the mean
+    difference of the two scores in standard errors
+    """
+    count = len(history)
+    ranked = sorted([(sums[square], square) for square in sums], reverse=True)
+    leader = ranked[0][1]
+    runner_up = ranked[1][1]
+    total = 0.0
+    total_squares = 0.0
+    for trial_scores in history:
+        difference = trial_scores[leader] - trial_scores[runner_up]
+        total += difference
+        total_squares += difference * difference
+    mean = total / count
+    variance = max(total_squares / count - mean * mean, 0.0) * count / max(count - 1, 1)
+    error = math.sqrt(variance / count)
+    if error == 0.0:
+        if mean > 0:
+            z_value = float("inf")
+        else:
+            z_value = 0.0
+    else:
+        z_value = mean / error
+    return leader, runner_up, z_value
+
+def mc_move_adaptive(board, player, trials):
+    """
+    mc_move that runs trials in batches of MC_ADAPTIVE_BATCH and stops
+    once the best square beats the runner-up, or after trials trials.
+    Each check tests at confidence 1 - (1 - MC_CONFIDENCE) / checks,
+    where checks is the number of batches, so by the union bound all
+    the checks together hold MC_CONFIDENCE, up to the normal
+    approximation.  The trials spent are recorded in ADAPTIVE_STATS.
+    """
+    empty_squares = board.get_empty_squares()
+    dim = board.get_dim()
+    sums = dict([(square, 0.0) for square in empty_squares])
+    history = []
+    checks = max(int(math.ceil(float(trials) / MC_ADAPTIVE_BATCH)), 1)
+    threshold = z_score(1 - (1 - MC_CONFIDENCE) / checks)
+    bitboard = poc_ttt_bitboard.from_board(board)
+    spent = 0
+    z_value = None
+    stopped = False
+    while spent < trials and len(empty_squares) > 1:
+        batch = min(MC_ADAPTIVE_BATCH, trials - spent)
+        for dummy in range(batch):
+            board_clone = bitboard.clone()
+            mc_trial(board_clone, player)
+            trial_scores = [[0 for dummy_col in range(dim)] for dummy_row in range(dim)]
+            mc_update_scores(trial_scores, board_clone, player)
+            values = {}
+            for square in empty_squares:
+                values[square] = trial_scores[square[0]][square[1]]
+                sums[square] += values[square]
+            history.append(values)
+        spent += batch
+        z_value = mc_separation(sums, history)[2]
+        if z_value >= threshold:
+            stopped = True
+            break
+
+    scores = [[0 for dummy_col in range(dim)] for dummy_row in range(dim)]
+    for square in empty_squares:
+        scores[square[0]][square[1]] = sums[square] / max(spent, 1)
+
+    ADAPTIVE_STATS["moves"] += 1
+    ADAPTIVE_STATS["trials"] += spent
+    if stopped and spent < trials:
+        ADAPTIVE_STATS["early_stops"] += 1
+    ADAPTIVE_STATS["last"] = {"trials": spent, "cap": trials, "z": z_value}
+    return get_best_move(board, scores)
+
+def mc_shard(task):
+    """
+    Run one shard of trials with its own random generator.
+
+    task: tuple (board, player, trials, seed)
+
+    Returns the grid of summed scores of the shard
+    """
+    board, player, trials, seed = task
+    rng = random.Random(seed)
+    dim = board.get_dim()
+    scores = [[0 for dummy_col in range(dim)] for dummy_row in range(dim)]
+    for dummy in range(trials):
+        board_clone = board.clone()
+        mc_trial(board_clone, player, rng)
+        mc_update_scores(scores, board_clone, player)
+    return scores
+
+def mc_parallel_scores(board, player, trials, workers = None, seed = None):
+    """
+    Run trials split into shards of MC_SHARD trials, see
+    poc_pool.shards, across a pool of workers.
+
+    Returns the grid of summed scores over all trials
+    """
+    bitboard = poc_ttt_bitboard.from_board(board)
+    tasks = [(bitboard, player, shard_trials, shard_seed)
+             for shard_trials, shard_seed in poc_pool.shards(trials, MC_SHARD, seed)]
+    results = poc_pool.run_shards(mc_shard, tasks, workers)
+
+    dim = board.get_dim()
+    scores = [[0 for dummy_col in range(dim)] for dummy_row in range(dim)]
+    for shard_scores in results:
+        for row in range(dim):
+            for col in range(dim):
+                scores[row][col] += shard_scores[row][col]
+    return scores
+
+def mc_move_parallel(board, player, trials):
+    """
+    mc_move with the trials run across MC_WORKERS processes
+    """
+    if MC_SEED is None:
+        seed = random.getrandbits(32)
+    else:
+        seed = MC_SEED
+    scores = mc_parallel_scores(board, player, trials, MC_WORKERS, seed)
+    dim = board.get_dim()
+    for row in range(dim):
+        for col in range(dim):
+            scores[row][col] = float(scores[row][col]) / trials
     return get_best_move(board, scores)
 
+def mc_batch_scores(board, player, trials, rng):
+    """
+    Simulate trials random games at once with NumPy and score them
+    like mc_update_scores.
+
+    Each batch draws a random order in which the empty squares would
+    be filled, players alternating from player.  A game ends at the
+    first move that completes a line, so the winner is the owner of
+    the line completed earliest and only squares filled by then count.
+
+    rng: numpy.random.RandomState
+
+    Returns the grid of summed scores over all trials
+    """
+    # Imported here since CodeSkulptor has no NumPy
+    import numpy
+
+    bitboard = poc_ttt_bitboard.from_board(board)
+    dim = bitboard.get_dim()
+    ncells = dim * dim
+    xmask, omask = bitboard.masks()
+    line_masks = poc_ttt_bitboard.board_geometry(dim)[1]
+    lines = numpy.array([[idx for idx in range(ncells) if mask >> idx & 1]
+                         for mask in line_masks])
+
+    # Squares hold +1 for PLAYERX, -1 for PLAYERO and 0 when empty
+    start = numpy.zeros(ncells, dtype=numpy.int8)
+    for idx in range(ncells):
+        if xmask >> idx & 1:
+            start[idx] = 1
+        elif omask >> idx & 1:
+            start[idx] = -1
+    empty = numpy.flatnonzero(start == 0)
+    if player == provided.PLAYERX:
+        sign = 1
+    else:
+        sign = -1
+    movers = numpy.where(numpy.arange(len(empty)) % 2 == 0, sign, -sign)
+    never = ncells + 1
+
+    totals = numpy.zeros(ncells)
+    remaining = trials
+    while remaining > 0:
+        batch = min(MC_BATCH, remaining)
+        remaining -= batch
+        rows = numpy.arange(batch)[:, None]
+        filled = empty[numpy.argsort(rng.random_sample((batch, len(empty))), axis=1)]
+        owners = numpy.tile(start, (batch, 1))
+        owners[rows, filled] = movers
+        times = numpy.full((batch, ncells), -1, dtype=numpy.int32)
+        times[rows, filled] = numpy.arange(len(empty))
+
+        line_sums = owners[:, lines].sum(axis=2)
+        line_times = numpy.where(numpy.abs(line_sums) == dim,
+                                 times[:, lines].max(axis=2), never)
+        first = line_times.argmin(axis=1)
+        end = line_times[numpy.arange(batch), first]
+        winners = numpy.sign(line_sums[numpy.arange(batch), first]) * (end < never)
+        if bitboard.outcome(provided.PLAYERX) != provided.PLAYERX:
+            # Reverse game: completing a line loses
+            winners = -winners
+
+        final = owners * (times <= end[:, None])
+        values = numpy.where(final == sign, MCMATCH,
+                             numpy.where(final == -sign, -MCOTHER, 0.0))
+        totals += (winners * sign).dot(values)
+
+    return [[totals[row * dim + col] for col in range(dim)] for row in range(dim)]
+
+def mc_move_numpy(board, player, trials):
+    """
+    mc_move with the trials simulated in batches by the NumPy engine
+    """
+    import numpy
+    rng = numpy.random.RandomState(MC_SEED)
+    scores = mc_batch_scores(board, player, trials, rng)
+    dim = board.get_dim()
+    for row in range(dim):
+        for col in range(dim):
+            scores[row][col] = float(scores[row][col]) / trials
+    return get_best_move(board, scores)
+
+def run_scaling_benchmark(dims = (3, 5, 7), trial_counts = (10000, 100000, 1000000),
+                          max_workers = None, seed = 0):
+    """
+    Print the time, speedup and parallel efficiency of
+    mc_parallel_scores from 1 to max_workers processes (default: one
+    per core) on empty boards
+    """
+    import multiprocessing
+    if max_workers is None:
+        max_workers = multiprocessing.cpu_count()
+    try:
+        for dim in dims:
+            board = poc_ttt_bitboard.TTTBitBoard(dim)
+            for trials in trial_counts:
+                base_time = None
+                for workers in range(1, max_workers + 1):
+                    if workers > 1:
+                        poc_pool.get_pool(workers)
+                    start = time.time()
+                    mc_parallel_scores(board, provided.PLAYERX, trials, workers, seed)
+                    elapsed = time.time() - start
+                    if base_time is None:
+                        base_time = elapsed
+                    speedup = base_time / elapsed
+                    print "%dx%d %7d trials %2d workers: %8.2f s  speedup %5.2f  efficiency %3.0f%%" % (
+                        dim, dim, trials, workers, elapsed, speedup, 100.0 * speedup / workers)
+    finally:
+        poc_pool.close_pools()
+
 
 # Test game with the console or the GUI.
 # Uncomment whichever you prefer.
 # Both should be commented out when you submit for
 # testing to save time.
 
-provided.play_game(mc_move, NTRIALS, False)        
-poc_ttt_gui.run_gui(3, provided.PLAYERX, mc_move, NTRIALS, False)
+#provided.play_game(mc_move, NTRIALS, False)        
+#poc_ttt_gui.run_gui(3, provided.PLAYERX, mc_move, NTRIALS, False)
+#run_scaling_benchmark()
@@ -0,0 +1,333 @@
+"""
+Headless Tic-Tac-Toe tournament and benchmark harness
+Plays move functions with the provided.play_game contract,
+move_function(board, player, trials) -> (row, col), against each other
+"""
+
+import csv
+import json
+import random
+import time
+import zlib
+import poc_ttt_provided as provided
+
+# Default tournament settings
+ENGINE_NAMES = ("random", "mc", "mc_adaptive", "mcts", "minimax", "minimax_search")
+DIMS = (3,)
+GAMES = 20          # Games per pairing and board size, sides alternate
+TRIALS = 100        # Trials passed to the Monte Carlo engines
+PERCENTILES = (50, 90, 99)
+
+
+class Engine:
+    """
+    Move function under test together with a counter of the work it
+    has done, e.g. nodes searched or playouts run, and the name of
+    that unit of work
+    """
+
+    def __init__(self, name, move_function, trials = 1, work = None, work_unit = None):
+        """
+        Create an engine.  work is a function returning the total work
+        done so far, or None if the engine does not count its work.
+        """
+        self.name = name
+        self.move_function = move_function
+        self.trials = trials
+        self.work_unit = work_unit
+        self._work = work
+
+    def work(self):
+        """
+        Return the total work done so far
+        """
+        if self._work is None:
+            return 0
+        return self._work()
+
+def make_random(seed):
+    """
+    Engine that plays a uniformly random empty square
+    """
+    rng = random.Random(seed)
+    def random_move(board, dummy_player, dummy_trials):
+        """
+        Random move function
+        """
+        return rng.choice(board.get_empty_squares())
+    return Engine("random", random_move)
+
+def make_mc(dummy_seed):
+    """
+    Flat Monte Carlo engine counting playouts.  It draws from the
+    module level random generator, which run_pairing seeds.
+    """
+    import poc_ttt_template
+    counter = [0]
+    def mc_move(board, player, trials):
+        """
+        mc_move counting its trials
+        """
+        counter[0] += trials
+        return poc_ttt_template.mc_move(board, player, trials)
+    return Engine("mc", mc_move, TRIALS, lambda: counter[0], "playouts")
+
+def make_mc_adaptive(dummy_seed):
+    """
+    Early-stopping Monte Carlo engine counting playouts
+    """
+    import poc_ttt_template
+    start = poc_ttt_template.ADAPTIVE_STATS["trials"]
+    return Engine("mc_adaptive", poc_ttt_template.mc_move_adaptive, TRIALS,
+                  lambda: poc_ttt_template.ADAPTIVE_STATS["trials"] - start, "playouts")
+
+def make_mc_numpy(seed):
+    """
+    NumPy batch Monte Carlo engine counting playouts, drawing from its
+    own generator seeded with seed
+    """
+    import numpy
+    import poc_ttt_template
+    rng = numpy.random.RandomState(seed)
+    counter = [0]
+    def mc_move(board, player, trials):
+        """
+        mc_move_numpy with the engine generator, counting its trials
+        """
+        counter[0] += trials
+        scores = poc_ttt_template.mc_batch_scores(board, player, trials, rng)
+        return poc_ttt_template.get_best_move(board, scores)
+    return Engine("mc_numpy", mc_move, TRIALS, lambda: counter[0], "playouts")
+
+def make_mcts(seed):
+    """
+    Monte Carlo Tree Search engine counting iterations
+    """
+    import poc_ttt_mcts
+    player = poc_ttt_mcts.MCTSPlayer(seed = seed)
+    return Engine("mcts", player, TRIALS,
+                  lambda: player.stats()["iterations"], "iterations")
+
+def make_minimax(dummy_seed):
+    """
+    Mini-max engine as played by poc_tttmm.move_wrapper, answering
+    from the opening book where it can.  Work is searched nodes plus
+    one per book move.
+    """
+    import poc_tttmm
+    engine = poc_tttmm.MinimaxEngine()
+    book_moves = [0]
+    def minimax_move(board, player, dummy_trials):
+        """
+        move_wrapper counting its book moves
+        """
+        engine.observe(board)
+        move = poc_tttmm.book_move(board, player)
+        if move is None:
+            move = poc_tttmm.mm_move(board, player, engine)
+        else:
+            book_moves[0] += 1
+        return move[1]
+    return Engine("minimax", minimax_move, 1,
+                  lambda: engine.stats()["nodes"] + book_moves[0],
+                  "nodes and book moves")
+
+def make_minimax_search(dummy_seed):
+    """
+    Mini-max engine that always searches, without the opening book,
+    counting searched nodes
+    """
+    import poc_tttmm
+    engine = poc_tttmm.MinimaxEngine()
+    def minimax_move(board, player, dummy_trials):
+        """
+        mm_move without the opening book
+        """
+        engine.observe(board)
+        return poc_tttmm.mm_move(board, player, engine)[1]
+    return Engine("minimax_search", minimax_move, 1,
+                  lambda: engine.stats()["nodes"], "nodes")
+
+# Engine factories by name, each taking a seed
+ENGINES = {"random": make_random,
+           "mc": make_mc,
+           "mc_adaptive": make_mc_adaptive,
+           "mc_numpy": make_mc_numpy,
+           "mcts": make_mcts,
+           "minimax": make_minimax,
+           "minimax_search": make_minimax_search}
+
+def percentile(values, percent):
+    """
+    Return the nearest-rank percentile of a list of numbers
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = int(round(percent / 100.0 * (len(ordered) - 1)))
+    return ordered[rank]
+
+def peak_memory_kb():
+    """
+    Return the peak resident memory of this process in kilobytes, or
+    None where the resource module is unavailable
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def play_timed_game(engine_x, engine_o, dim, reverse, latencies, work_time):
+    """
+    Play one game like provided.play_game without printing, timing
+    every move.  Latencies are appended to latencies[name] and time
+    spent is added to work_time[name].
+
+    Returns the winner, or DRAW
+    """
+    board = provided.TTTBoard(dim, reverse)
+    player = provided.PLAYERX
+    while board.check_win() == None:
+        if player == provided.PLAYERX:
+            engine = engine_x
+        else:
+            engine = engine_o
+        start = time.time()
+        row, col = engine.move_function(board.clone(), player, engine.trials)
+        elapsed = time.time() - start
+        latencies[engine.name].append(elapsed)
+        work_time[engine.name] += elapsed
+        board.move(row, col, player)
+        player = provided.switch_player(player)
+    return board.check_win()
+
+def run_pairing(name_a, name_b, dim, games = GAMES, seed = 0, reverse = False):
+    """
+    Play games between two engines on a dim x dim board, alternating
+    who plays X.  Each game builds fresh engines from its own seed
+    and reseeds the module level random generator.
+
+    Returns a list with one record per engine
+    """
+    if name_a == name_b:
+        raise ValueError("an engine cannot play itself in a pairing")
+    rng = random.Random(zlib.crc32("%s %s %d %d" % (name_a, name_b, dim, seed)))
+    records = {}
+    latencies = {name_a: [], name_b: []}
+    work_time = {name_a: 0.0, name_b: 0.0}
+    work = {name_a: 0, name_b: 0}
+    work_units = {}
+    for name in (name_a, name_b):
+        records[name] = {"win": 0, "draw": 0, "loss": 0}
+
+    for game in range(games):
+        engine_a = ENGINES[name_a](rng.getrandbits(32))
+        engine_b = ENGINES[name_b](rng.getrandbits(32))
+        random.seed(rng.getrandbits(32))
+        if game % 2 == 0:
+            sides = {provided.PLAYERX: engine_a, provided.PLAYERO: engine_b}
+        else:
+            sides = {provided.PLAYERX: engine_b, provided.PLAYERO: engine_a}
+        winner = play_timed_game(sides[provided.PLAYERX], sides[provided.PLAYERO],
+                                 dim, reverse, latencies, work_time)
+        for player, engine in sides.items():
+            if winner == provided.DRAW:
+                records[engine.name]["draw"] += 1
+            elif winner == player:
+                records[engine.name]["win"] += 1
+            else:
+                records[engine.name]["loss"] += 1
+        work[name_a] += engine_a.work()
+        work[name_b] += engine_b.work()
+        work_units[name_a] = engine_a.work_unit
+        work_units[name_b] = engine_b.work_unit
+
+    results = []
+    for name, opponent in ((name_a, name_b), (name_b, name_a)):
+        record = {"engine": name, "opponent": opponent, "dim": dim,
+                  "games": games, "seed": seed, "moves": len(latencies[name]),
+                  "work": work[name], "work_unit": work_units.get(name)}
+        record.update(records[name])
+        for percent in PERCENTILES:
+            record["latency_p%d_ms" % percent] = 1000.0 * percentile(latencies[name], percent)
+        record["latency_max_ms"] = 1000.0 * max(latencies[name] + [0.0])
+        if work_time[name] > 0:
+            record["work_per_second"] = work[name] / work_time[name]
+        else:
+            record["work_per_second"] = 0.0
+        record["peak_memory_kb"] = peak_memory_kb()
+        results.append(record)
+    return results
+
+def run_isolated_pairing(args):
+    """
+    run_pairing with a tuple of arguments, for use in a worker process
+    """
+    return run_pairing(*args)
+
+def run_tournament(names = ENGINE_NAMES, dims = DIMS, games = GAMES, seed = 0,
+                   json_path = None, csv_path = None, isolate = False):
+    """
+    Play every pairing of the named engines on every board size.  With
+    isolate, each pairing runs in a fresh process so that peak memory
+    is measured per pairing.  Results are optionally written as JSON
+    and CSV.
+
+    Returns the list of per-engine records
+    """
+    tasks = []
+    for dim in dims:
+        for idx_a in range(len(names)):
+            for idx_b in range(idx_a + 1, len(names)):
+                tasks.append((names[idx_a], names[idx_b], dim, games, seed))
+
+    results = []
+    for task in tasks:
+        if isolate:
+            # Imported here since CodeSkulptor has no multiprocessing
+            import multiprocessing
+            pool = multiprocessing.Pool(1)
+            records = pool.apply(run_isolated_pairing, (task,))
+            pool.close()
+            pool.join()
+        else:
+            records = run_pairing(*task)
+        results.extend(records)
+        for record in records:
+            print "%dx%d %-12s vs %-12s W %3d D %3d L %3d  p50 %8.2f ms  p99 %8.2f ms  %10.0f work/s" % (
+                record["dim"], record["dim"], record["engine"], record["opponent"],
+                record["win"], record["draw"], record["loss"],
+                record["latency_p50_ms"], record["latency_p99_ms"],
+                record["work_per_second"])
+
+    if json_path is not None:
+        write_json(results, json_path)
+    if csv_path is not None:
+        write_csv(results, csv_path)
+    return results
+
+def write_json(results, path):
+    """
+    Write tournament records to path as JSON
+    """
+    output = open(path, "w")
+    json.dump(results, output, indent = 1, sort_keys = True)
+    output.close()
+
+def write_csv(results, path):
+    """
+    Write tournament records to path as CSV with one row per engine
+    and pairing
+    """
+    if not results:
+        return
+    fields = sorted(results[0].keys())
+    output = open(path, "wb")
+    writer = csv.DictWriter(output, fields)
+    writer.writeheader()
+    for record in results:
+        writer.writerow(record)
+    output.close()
+
+#run_tournament(json_path = "ttt_tournament.json", csv_path = "ttt_tournament.csv")
@@ -2,56 +2,552 @@
 Mini-max Tic-Tac-Toe Player
 """
 
+import collections
+import os
+import time
 import poc_ttt_gui
 import poc_ttt_provided as provided
-
-# Set timeout, as mini-max can take a long time
-import codeskulptor
-codeskulptor.set_timeout(60)
+import poc_ttt_bitboard
 
 # SCORING VALUES - DO NOT MODIFY
 SCORES = {provided.PLAYERX: 1,
           provided.DRAW: 0,
           provided.PLAYERO: -1}
 
-def mm_move(board, player):
+# Search settings
+SEARCH_MODE = "alphabeta"    # "minimax" for the exhaustive search
+TIME_BUDGET = 1.0            # Seconds per move for iterative deepening
+TT_SIZE = 1000000            # Maximum number of positions kept before eviction
+HEURISTIC_WEIGHT = 0.5       # Bound on heuristic scores, below a win
+
+# Transposition table entry flags
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Bound on every score seen by the search
+INFINITY = 2
+
+# Opening book of solved 3x3 positions, loaded on first use
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "poc_tttmm_book.txt")
+BOOK_CHARS = {provided.EMPTY: ".",
+              provided.PLAYERX: "X",
+              provided.PLAYERO: "O"}
+BOOK_REVERSE = {False: "N", True: "R"}
+_BOOK = None
+
+# Caches of board geometry keyed on dimension
+_SYMMETRIES = {}
+_LINES = {}
+_MOVE_ORDER = {}
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget runs out
+    """
+    pass
+
+def board_symmetries(dim):
+    """
+    Compute the 8 rotations and reflections of a dim x dim board.
+
+    Returns a list of (perm, inverse) pairs of flat cell indices where
+    perm[idx] is the cell of the original board that lands on cell idx
+    of the transformed board, and inverse undoes the mapping.
+    """
+    if dim in _SYMMETRIES:
+        return _SYMMETRIES[dim]
+    last = dim - 1
+    transforms = [lambda row, col: (row, col),
+                  lambda row, col: (last - col, row),
+                  lambda row, col: (last - row, last - col),
+                  lambda row, col: (col, last - row),
+                  lambda row, col: (row, last - col),
+                  lambda row, col: (last - row, col),
+                  lambda row, col: (col, row),
+                  lambda row, col: (last - col, last - row)]
+    symmetries = []
+    for transform in transforms:
+        perm = []
+        for row in range(dim):
+            for col in range(dim):
+                src_row, src_col = transform(row, col)
+                perm.append(src_row * dim + src_col)
+        inverse = [0] * len(perm)
+        for idx in range(len(perm)):
+            inverse[perm[idx]] = idx
+        symmetries.append((perm, inverse))
+    _SYMMETRIES[dim] = symmetries
+    return symmetries
+
+def canonical_key(board, player):
+    """
+    Compute the transposition table key of a board with player to
+    move.  Symmetric boards share the same key, and reverse games
+    never share a key with normal games.
+
+    Returns a tuple with two elements.  The first element is the key
+    and the second element is the (perm, inverse) pair mapping the
+    board onto its canonical orientation.
+    """
+    dim = board.get_dim()
+    cells = [board.square(row, col) for row in range(dim) for col in range(dim)]
+    best_key = None
+    best_symmetry = None
+    for symmetry in board_symmetries(dim):
+        key = tuple([cells[idx] for idx in symmetry[0]])
+        if best_key is None or key < best_key:
+            best_key = key
+            best_symmetry = symmetry
+    return (dim, player, poc_ttt_bitboard.is_reversed(board), best_key), best_symmetry
+
+def board_lines(dim):
     """
-    Make a move on the board.
+    Return the rows, columns and diagonals of a dim x dim board as
+    lists of (row, col) squares.
+    """
+    if dim not in _LINES:
+        lines = []
+        for idx in range(dim):
+            lines.append([(idx, col) for col in range(dim)])
+            lines.append([(row, idx) for row in range(dim)])
+        lines.append([(idx, idx) for idx in range(dim)])
+        lines.append([(idx, dim - idx - 1) for idx in range(dim)])
+        _LINES[dim] = lines
+    return _LINES[dim]
+
+def move_order(dim):
+    """
+    Return the squares of a dim x dim board ordered center first, then
+    corners, then by distance from the center.
+    """
+    if dim not in _MOVE_ORDER:
+        last = dim - 1
+        corners = [(0, 0), (0, last), (last, 0), (last, last)]
+        def priority(square):
+            """
+            Sort key of a square
+            """
+            distance = abs(2 * square[0] - last) + abs(2 * square[1] - last)
+            if distance <= 2:
+                return (0, distance)
+            if square in corners:
+                return (1, distance)
+            return (2, distance)
+        squares = [(row, col) for row in range(dim) for col in range(dim)]
+        _MOVE_ORDER[dim] = sorted(squares, key=priority)
+    return _MOVE_ORDER[dim]
+
+def evaluate(board):
+    """
+    Heuristic score of an unfinished board for PLAYERX.  Lines held by
+    only one player count the square of their marks, and the total is
+    scaled strictly inside +/- HEURISTIC_WEIGHT.
+    """
+    dim = board.get_dim()
+    lines = board_lines(dim)
+    total = 0
+    for line in lines:
+        marks = [board.square(row, col) for (row, col) in line]
+        x_marks = marks.count(provided.PLAYERX)
+        o_marks = marks.count(provided.PLAYERO)
+        if x_marks and not o_marks:
+            total += x_marks * x_marks
+        elif o_marks and not x_marks:
+            total -= o_marks * o_marks
+    return HEURISTIC_WEIGHT * total / float(len(lines) * dim * dim)
+
+
+class MinimaxEngine:
+    """
+    Mini-max search with a bounded transposition table that is shared
+    between calls within the same game.
+    """
+
+    def __init__(self, max_size=TT_SIZE):
+        """
+        Create an engine caching at most max_size positions
+        """
+        self._max_size = max_size
+        self._table = collections.OrderedDict()
+        self._last_dim = None
+        self._last_stones = None
+        self._killers = {}
+        self._deadline = None
+        self.reset_stats()
+
+    def new_game(self):
+        """
+        Forget all cached positions
+        """
+        self._table.clear()
+        self._killers = {}
+        self._last_dim = None
+        self._last_stones = None
+
+    def observe(self, board):
+        """
+        Start a new game when board cannot follow the last board
+        seen, i.e. the dimension changed or stones were removed.
+        """
+        dim = board.get_dim()
+        stones = dim * dim - len(board.get_empty_squares())
+        if dim != self._last_dim or self._last_stones is None \
+           or stones <= self._last_stones:
+            self.new_game()
+        self._last_dim = dim
+        self._last_stones = stones
+
+    def reset_stats(self):
+        """
+        Zero the search counters
+        """
+        self._nodes = 0
+        self._probes = 0
+        self._hits = 0
+        self._evictions = 0
+        self._depth = 0
+
+    def stats(self):
+        """
+        Return a dictionary of search counters
+        """
+        if self._probes:
+            hit_rate = float(self._hits) / self._probes
+        else:
+            hit_rate = 0.0
+        return {"nodes": self._nodes,
+                "probes": self._probes,
+                "hits": self._hits,
+                "hit_rate": hit_rate,
+                "evictions": self._evictions,
+                "depth": self._depth,
+                "size": len(self._table)}
+
+    def lookup(self, key):
+        """
+        Return the cached (score, canonical move index, depth, flag)
+        for key, or None if the position has not been searched.  The
+        score is for the player to move.
+        """
+        self._probes += 1
+        entry = self._table.pop(key, None)
+        if entry is None:
+            return None
+        self._table[key] = entry
+        self._hits += 1
+        return entry
+
+    def store(self, key, entry):
+        """
+        Cache entry under key, evicting the least recently used
+        position when the table is full.
+        """
+        if key in self._table:
+            del self._table[key]
+        elif len(self._table) >= self._max_size:
+            self._table.popitem(last=False)
+            self._evictions += 1
+        self._table[key] = entry
+
+    def search(self, board, player):
+        """
+        Compute the mini-max score and best move of board for player.
+        The board must support unmove, e.g. a TTTBitBoard.
+        """
+        self._nodes += 1
+        winner = board.check_win()
+        if winner is not None:
+            return SCORES[winner], (-1, -1)
+
+        dim = board.get_dim()
+        empty_squares = board.get_empty_squares()
+        key, symmetry = canonical_key(board, player)
+        entry = self.lookup(key)
+        if entry is not None and entry[3] == EXACT \
+           and entry[2] >= len(empty_squares):
+            move = symmetry[0][entry[1]]
+            return entry[0] * SCORES[player], (move // dim, move % dim)
+
+        max_score = -1
+        max_score_square = None
+        other_player = provided.switch_player(player)
+        for square in empty_squares:
+            board.move(square[0], square[1], player)
+            score = self.search(board, other_player)[0]
+            board.unmove(square[0], square[1])
+            if score * SCORES[player] > max_score or max_score_square is None:
+                max_score = score * SCORES[player]
+                max_score_square = square
+            if max_score > 0:
+                break
+        move = max_score_square[0] * dim + max_score_square[1]
+        self.store(key, (max_score, symmetry[1][move],
+                         len(empty_squares), EXACT))
+        return max_score * SCORES[player], max_score_square
+
+    def order_moves(self, empty_squares, dim, hash_move, ply):
+        """
+        Order empty_squares for the search: the transposition table
+        move, then the killer moves of this ply, then center and
+        corner squares first.
+        """
+        empty = set(empty_squares)
+        ordered = []
+        if hash_move in empty:
+            ordered.append(hash_move)
+        for killer in self._killers.get(ply, []):
+            if killer in empty and killer not in ordered:
+                ordered.append(killer)
+        for square in move_order(dim):
+            if square in empty and square not in ordered:
+                ordered.append(square)
+        return ordered
+
+    def add_killer(self, ply, square):
+        """
+        Remember square as a move that caused a cutoff at ply
+        """
+        killers = self._killers.setdefault(ply, [])
+        if square in killers:
+            killers.remove(square)
+        killers.insert(0, square)
+        del killers[2:]
+
+    def alphabeta(self, board, player, depth, alpha, beta, ply):
+        """
+        Depth-limited negamax search with alpha-beta pruning.
+
+        Returns a tuple with two elements.  The first element is the
+        score of board for player and the second element is the best
+        move found, or None at a leaf.  The board must support unmove.
+        """
+        self._nodes += 1
+        if self._deadline is not None and self._nodes % 256 == 0 \
+           and time.time() > self._deadline:
+            raise SearchTimeout()
+        winner = board.check_win()
+        if winner is not None:
+            return SCORES[winner] * SCORES[player], None
+        empty_squares = board.get_empty_squares()
+        depth = min(depth, len(empty_squares))
+        if depth == 0:
+            return evaluate(board) * SCORES[player], None
+
+        dim = board.get_dim()
+        key, symmetry = canonical_key(board, player)
+        entry = self.lookup(key)
+        hash_move = None
+        if entry is not None:
+            move = symmetry[0][entry[1]]
+            hash_move = (move // dim, move % dim)
+            if entry[2] >= depth:
+                if entry[3] == EXACT \
+                   or (entry[3] == LOWER and entry[0] >= beta) \
+                   or (entry[3] == UPPER and entry[0] <= alpha):
+                    return entry[0], hash_move
+
+        alpha_orig = alpha
+        best_value = -INFINITY
+        best_square = None
+        other_player = provided.switch_player(player)
+        for square in self.order_moves(empty_squares, dim, hash_move, ply):
+            board.move(square[0], square[1], player)
+            value = -self.alphabeta(board, other_player, depth - 1,
+                                    -beta, -alpha, ply + 1)[0]
+            board.unmove(square[0], square[1])
+            if value > best_value:
+                best_value = value
+                best_square = square
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                self.add_killer(ply, square)
+                break
+
+        if best_value <= alpha_orig:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        move = best_square[0] * dim + best_square[1]
+        self.store(key, (best_value, symmetry[1][move], depth, flag))
+        return best_value, best_square
+
+    def iterative_search(self, board, player, budget=None):
+        """
+        Run alpha-beta searches of increasing depth until the board is
+        solved or budget seconds have passed.  The first iteration
+        always completes.
+
+        Returns a tuple with two elements.  The first element is the
+        score of board for PLAYERX and the second element is the
+        desired move as a tuple, (row, col).
+        """
+        winner = board.check_win()
+        if winner is not None:
+            return SCORES[winner], (-1, -1)
+        board = poc_ttt_bitboard.from_board(board)
+        max_depth = len(board.get_empty_squares())
+        start = time.time()
+        result = None
+        depth = 1
+        while depth <= max_depth:
+            if result is not None and budget is not None:
+                self._deadline = start + budget
+            try:
+                result = self.alphabeta(board, player, depth,
+                                        -INFINITY, INFINITY, 0)
+            except SearchTimeout:
+                break
+            finally:
+                self._deadline = None
+            self._depth = depth
+            if abs(result[0]) >= 1:
+                break
+            depth += 1
+        return result[0] * SCORES[player], result[1]
+
+ENGINE = MinimaxEngine()
+
+def mm_move(board, player, engine = None):
+    """
+    Make a move on the board, searching with engine, by default the
+    shared ENGINE.
     
     Returns a tuple with two elements.  The first element is the score
     of the given board and the second element is the desired move as a
     tuple, (row, col).
     """
+    if engine is None:
+        engine = ENGINE
+    if SEARCH_MODE == "alphabeta":
+        return engine.iterative_search(board, player, TIME_BUDGET)
+    return engine.search(poc_ttt_bitboard.from_board(board), player)
     
-    if board.check_win() == provided.DRAW:
-        return 0, (-1, -1)
-    elif board.check_win() == provided.PLAYERX:
-        return SCORES[provided.PLAYERX],(-1, -1)
-    elif board.check_win() == provided.PLAYERO:
-        return SCORES[provided.PLAYERO],(-1, -1)    
-    
-    empty_squares = board.get_empty_squares()
-    max_score = -1
-    max_score_square = None
-    other_player = provided.switch_player(player)
-    for dummy_squares in empty_squares:
-        board_temp = board.clone()
-        board_temp.move(dummy_squares[0], dummy_squares[1], player)
-        score,square = mm_move(board_temp, other_player)
-        if score * SCORES[player] > 0:
-            return score,dummy_squares
-        if score * SCORES[player] > max_score:
-            max_score = score * SCORES[player]
-            max_score_square = dummy_squares
-    return max_score/ SCORES[player],max_score_square
-    
+
+def generate_book(path=BOOK_PATH):
+    """
+    Solve every 3x3 position reachable from the empty board, with
+    either player moving first, in normal and reverse games, and
+    write the score and best move of each unfinished canonical
+    position to path.  Each line holds the 9 squares and the player
+    to move, R for a reverse game or N otherwise, the score and the
+    flat index of the move on the canonical board.
+
+    Returns the number of reachable positions visited.
+    """
+    engine = MinimaxEngine()
+    book = {}
+    seen = set()
+    for reverse in (False, True):
+        for first_player in (provided.PLAYERX, provided.PLAYERO):
+            stack = [(poc_ttt_bitboard.TTTBitBoard(3, reverse), first_player)]
+            while stack:
+                board, player = stack.pop()
+                if (board.masks(), player, reverse) in seen:
+                    continue
+                seen.add((board.masks(), player, reverse))
+                if board.check_win() != None:
+                    continue
+                key, symmetry = canonical_key(board, player)
+                if key not in book:
+                    score, move = engine.search(board.clone(), player)
+                    book[key] = (score, symmetry[1][move[0] * 3 + move[1]])
+                for square in board.get_empty_squares():
+                    child = board.clone()
+                    child.move(square[0], square[1], player)
+                    stack.append((child, provided.switch_player(player)))
+
+    lines = []
+    for key, entry in book.items():
+        position = "".join([BOOK_CHARS[square] for square in key[3]])
+        lines.append("%s%s %s %d %d\n" % (position, BOOK_CHARS[key[1]],
+                                          BOOK_REVERSE[key[2]], entry[0], entry[1]))
+    lines.sort()
+    book_file = open(path, "w")
+    book_file.writelines(lines)
+    book_file.close()
+    return len(seen)
+
+def opening_book():
+    """
+    Return the opening book as a dictionary mapping transposition
+    table keys to (score, canonical move index), reading BOOK_PATH on
+    the first call.  A missing book file gives an empty book.
+    """
+    global _BOOK
+    if _BOOK is None:
+        squares = dict([(char, square) for (square, char) in BOOK_CHARS.items()])
+        book = {}
+        try:
+            book_file = open(BOOK_PATH)
+        except IOError:
+            book_file = []
+        for line in book_file:
+            fields = line.split()
+            cells = tuple([squares[char] for char in fields[0][:9]])
+            key = (3, squares[fields[0][9]], fields[1] == BOOK_REVERSE[True], cells)
+            book[key] = (int(fields[2]), int(fields[3]))
+        if book_file:
+            book_file.close()
+        _BOOK = book
+    return _BOOK
+
+def book_move(board, player):
+    """
+    Look up board with player to move in the opening book.
+
+    Returns a tuple (score, (row, col)) like mm_move, or None if the
+    position is not in the book.
+    """
+    if board.get_dim() != 3 or board.check_win() != None:
+        return None
+    key, symmetry = canonical_key(board, player)
+    entry = opening_book().get(key)
+    if entry is None:
+        return None
+    move = symmetry[0][entry[1]]
+    return entry[0], (move // 3, move % 3)
+
+def run_book_benchmark(repeats=5):
+    """
+    Print the latency of the first move on an empty 3x3 board for
+    both search modes and for the opening book
+    """
+    global SEARCH_MODE
+    saved_mode = SEARCH_MODE
+    board = provided.TTTBoard(3)
+    for mode in ("minimax", "alphabeta"):
+        SEARCH_MODE = mode
+        start = time.time()
+        for dummy_idx in range(repeats):
+            ENGINE.new_game()
+            mm_move(board, provided.PLAYERX)
+        print "search (%s): %.3f ms" % (mode, 1000.0 * (time.time() - start) / repeats)
+    SEARCH_MODE = saved_mode
+
+    start = time.time()
+    opening_book()
+    print "book load: %.3f ms" % (1000.0 * (time.time() - start))
+    start = time.time()
+    for dummy_idx in range(repeats):
+        book_move(board, provided.PLAYERX)
+    print "book: %.3f ms" % (1000.0 * (time.time() - start) / repeats)
 
 def move_wrapper(board, player, trials):
     """
     Wrapper to allow the use of the same infrastructure that was used
-    for Monte Carlo Tic-Tac-Toe.
+    for Monte Carlo Tic-Tac-Toe.  Positions in the opening book are
+    answered without searching.
     """
-    move = mm_move(board, player)
+    ENGINE.observe(board)
+    move = book_move(board, player)
+    if move is None:
+        move = mm_move(board, player)
     assert move[1] != (-1, -1), "returned illegal move (-1, -1)"
     return move[1]
 
@@ -62,7 +558,9 @@ def move_wrapper(board, player, trials):
 
 #provided.play_game(move_wrapper, 1, False)        
 #poc_ttt_gui.run_gui(3, provided.PLAYERO, move_wrapper, 1, False)
+#print generate_book()
+#run_book_benchmark()
 
-print mm_move(provided.TTTBoard(3, False, [[provided.PLAYERX, provided.PLAYERX, provided.PLAYERO], [provided.EMPTY, provided.PLAYERX, provided.PLAYERX], [provided.PLAYERO, provided.EMPTY, provided.PLAYERO]]), provided.PLAYERO) 
+#print mm_move(provided.TTTBoard(3, False, [[provided.PLAYERX, provided.PLAYERX, provided.PLAYERO], [provided.EMPTY, provided.PLAYERX, provided.PLAYERX], [provided.PLAYERO, provided.EMPTY, provided.PLAYERO]]), provided.PLAYERO) 
 #[-25.0 pts] mm_move(TTTBoard(3, False, [[PLAYERX, EMPTY, EMPTY], [PLAYERO, PLAYERO, EMPTY], [EMPTY, PLAYERX, EMPTY]]), PLAYERX) returned bad move (0, (-1, -1))
 #[-15.0 pts] mm_move(TTTBoard(3, False, [[EMPTY, EMPTY, PLAYERX], [EMPTY, EMPTY, EMPTY], [EMPTY, EMPTY, EMPTY]]), PLAYERO) returned invalid move (0, (-1, -1))
\ No newline at end of file
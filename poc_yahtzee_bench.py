@@ -0,0 +1,111 @@
+"""
+Command line micro-benchmarks of the Yahtzee planner
+For each hand size, times Yahtzee.strategy over seeded random hands
+with empty and with warm caches, with and without profiling, and
+summarizes the profile counters.
+
+    python poc_yahtzee_bench.py --sizes 4 5 6 7 8 --sides 6 --hands 20
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import Yahtzee
+
+def clear_caches():
+    """
+    Empty the hold cache of the planner
+    """
+    Yahtzee.HOLD_CACHE.clear()
+
+def time_pass(hands, num_die_sides):
+    """
+    Return the mean time of Yahtzee.strategy over hands in milliseconds
+    """
+    start = time.time()
+    for hand in hands:
+        Yahtzee.strategy(hand, num_die_sides)
+    return 1000.0 * (time.time() - start) / len(hands)
+
+def bench_size(hand_size, num_die_sides, num_hands, seed, emit = None):
+    """
+    Benchmark strategy on num_hands random hands of hand_size dice.
+    emit is passed to the profile and receives every call report.
+
+    Returns a dictionary of timings and mean profile counters per call
+    """
+    rng = random.Random(seed)
+    hands = [tuple(sorted([rng.randint(1, num_die_sides) for dummy_die in range(hand_size)]))
+             for dummy_hand in range(num_hands)]
+    clear_caches()
+    cold_ms = time_pass(hands, num_die_sides)
+    clear_caches()
+    profile = Yahtzee.enable_profiling(emit)
+    try:
+        profiled_ms = time_pass(hands, num_die_sides)
+    finally:
+        Yahtzee.disable_profiling()
+    warm_ms = time_pass(hands, num_die_sides)
+
+    hits = sum([report["caches"]["hold_cache"]["hits"] for report in profile.reports])
+    misses = sum([report["caches"]["hold_cache"]["misses"] for report in profile.reports])
+    result = {"hand_size": hand_size, "num_die_sides": num_die_sides, "hands": num_hands,
+              "cold_ms": cold_ms, "profiled_ms": profiled_ms, "warm_ms": warm_ms,
+              "hold_cache_hit_rate": float(hits) / max(1, hits + misses)}
+    for name, value in profile.counters.items():
+        result[name + "_per_call"] = float(value) / num_hands
+    for phase in ("gen_all_holds", "evaluate_holds"):
+        result[phase + "_ms"] = sum([report["phases_ms"].get(phase, 0.0)
+                                     for report in profile.reports]) / num_hands
+    return result
+
+def run_benchmark(sizes = (4, 5, 6, 7, 8), num_die_sides = 6, num_hands = 20, seed = 0,
+                  emit = None):
+    """
+    Print one line of results per hand size and return the results
+    """
+    # Build the one-off tables first so that they are not timed
+    Yahtzee.hold_table()
+    results = []
+    for hand_size in sizes:
+        result = bench_size(hand_size, num_die_sides, num_hands, seed, emit)
+        results.append(result)
+        print "%2d dice d%-2d  cold %9.3f ms  profiled %9.3f ms  warm %8.3f ms  holds %6.1f  outcomes %9.1f  hit rate %5.1f%%" % (
+            hand_size, num_die_sides, result["cold_ms"], result["profiled_ms"],
+            result["warm_ms"], result.get("holds_generated_per_call", 0.0),
+            result.get("score_summary_outcomes_per_call", 0.0),
+            100.0 * result["hold_cache_hit_rate"])
+    return results
+
+def main(args):
+    """
+    Run the benchmark with command line arguments
+    """
+    parser = argparse.ArgumentParser(description = "Micro-benchmarks of Yahtzee.strategy")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = [4, 5, 6, 7, 8],
+                        help = "hand sizes to benchmark")
+    parser.add_argument("--sides", type = int, default = 6, help = "sides on each die")
+    parser.add_argument("--hands", type = int, default = 20, help = "hands per size")
+    parser.add_argument("--seed", type = int, default = 0, help = "seed of the hands")
+    parser.add_argument("--reports", action = "store_true",
+                        help = "print the profile report of every strategy call as JSON")
+    parser.add_argument("--json", help = "write the results to this file as JSON")
+    options = parser.parse_args(args)
+
+    emit = None
+    if options.reports:
+        def emit(report):
+            """
+            Print a profile report as one line of JSON
+            """
+            print json.dumps(report, sort_keys = True)
+    results = run_benchmark(options.sizes, options.sides, options.hands, options.seed, emit)
+    if options.json:
+        output = open(options.json, "w")
+        json.dump(results, output, indent = 1, sort_keys = True)
+        output.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
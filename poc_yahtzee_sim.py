@@ -0,0 +1,136 @@
+"""
+Monte Carlo simulator for Yahtzee hold strategies
+Plays seeded turns, or games of several turns, with a strategy
+function strategy(hand, num_die_sides) -> (value, hold) such as
+Yahtzee.strategy, sharded across a pool of worker processes
+"""
+
+import random
+import time
+import Yahtzee
+import poc_pool
+
+# Default simulation settings
+NUM_DICE = 5
+NUM_DIE_SIDES = 6
+ROLLS = 2           # Rolls per turn, the first one included
+SIM_WORKERS = None  # Number of worker processes, None for one per core
+SIM_SHARD = 2000    # Number of turns per shard
+PERCENTILES = (5, 25, 50, 75, 95)
+
+def play_turn(strategy_function, rng, num_dice = NUM_DICE,
+              num_die_sides = NUM_DIE_SIDES, rolls = ROLLS):
+    """
+    Play one turn: roll all dice, then before each further roll keep
+    the hold chosen by strategy_function and reroll the other dice
+
+    Returns the score of the final hand
+    """
+    hand = [rng.randint(1, num_die_sides) for dummy_die in range(num_dice)]
+    for dummy_roll in range(rolls - 1):
+        hold = list(strategy_function(tuple(sorted(hand)), num_die_sides)[1])
+        hand = hold + [rng.randint(1, num_die_sides)
+                       for dummy_die in range(num_dice - len(hold))]
+    return Yahtzee.score(hand)
+
+def sim_shard(task):
+    """
+    Play one shard of games with its own random generator.
+
+    task: tuple (strategy_function, games, turns_per_game, num_dice,
+          num_die_sides, rolls, seed)
+
+    Returns a dictionary mapping each game score to its count
+    """
+    strategy_function, games, turns_per_game, num_dice, num_die_sides, rolls, seed = task
+    rng = random.Random(seed)
+    counts = {}
+    for dummy_game in range(games):
+        total = 0
+        for dummy_turn in range(turns_per_game):
+            total += play_turn(strategy_function, rng, num_dice, num_die_sides, rolls)
+        counts[total] = counts.get(total, 0) + 1
+    return counts
+
+def simulate(strategy_function = Yahtzee.strategy, games = 10000, turns_per_game = 1,
+             num_dice = NUM_DICE, num_die_sides = NUM_DIE_SIDES, rolls = ROLLS,
+             workers = SIM_WORKERS, seed = None):
+    """
+    Play games of turns_per_game turns, split into shards of about
+    SIM_SHARD turns, see poc_pool.shards, across a pool of workers.
+    strategy_function must be picklable, e.g. a module level function,
+    unless workers is 1.
+
+    Returns a dictionary mapping each game score to its count
+    """
+    shard_games = max(1, SIM_SHARD // turns_per_game)
+    tasks = [(strategy_function, size, turns_per_game, num_dice, num_die_sides,
+              rolls, shard_seed)
+             for size, shard_seed in poc_pool.shards(games, shard_games, seed)]
+
+    distribution = {}
+    for counts in poc_pool.run_shards(sim_shard, tasks, workers):
+        for total, count in counts.items():
+            distribution[total] = distribution.get(total, 0) + count
+    return distribution
+
+def summarize(distribution):
+    """
+    Return a dictionary with the number of games, mean, standard
+    deviation, minimum, maximum and PERCENTILES of a score
+    distribution from simulate
+    """
+    games = sum(distribution.values())
+    if not games:
+        return {"games": 0}
+    mean = sum([total * count for total, count in distribution.items()]) / float(games)
+    variance = sum([count * (total - mean) ** 2
+                    for total, count in distribution.items()]) / games
+    summary = {"games": games, "mean": mean, "std": variance ** 0.5,
+               "min": min(distribution), "max": max(distribution)}
+    ordered = sorted(distribution.items())
+    for percent in PERCENTILES:
+        rank = int(round(percent / 100.0 * (games - 1)))
+        seen = 0
+        for total, count in ordered:
+            seen += count
+            if seen > rank:
+                summary["p%d" % percent] = total
+                break
+    return summary
+
+def hold_nothing(dummy_hand, dummy_num_die_sides):
+    """
+    Baseline strategy that rerolls every die
+    """
+    return (0.0, ())
+
+def hold_all(hand, dummy_num_die_sides):
+    """
+    Baseline strategy that keeps every die
+    """
+    return (0.0, tuple(hand))
+
+def run_report(strategies = (Yahtzee.strategy, hold_all, hold_nothing),
+               games = 20000, turns_per_game = 1, workers = SIM_WORKERS, seed = 0):
+    """
+    Print the score distribution summary and throughput of each
+    strategy over the same seeded games
+    """
+    try:
+        for strategy_function in strategies:
+            if workers != 1:
+                poc_pool.get_pool(workers)
+            start = time.time()
+            distribution = simulate(strategy_function, games, turns_per_game,
+                                    workers = workers, seed = seed)
+            elapsed = time.time() - start
+            summary = summarize(distribution)
+            print "%-14s mean %7.3f  std %6.3f  p5 %3d  p50 %3d  p95 %3d  %9.0f turns/s" % (
+                strategy_function.__name__, summary["mean"], summary["std"],
+                summary["p5"], summary["p50"], summary["p95"],
+                games * turns_per_game / elapsed)
+    finally:
+        poc_pool.close_pools()
+
+#run_report()
@@ -0,0 +1,342 @@
+"""
+Optimal full-game solver for solitaire Yahtzee
+Backward induction over scorecard states with three rolls per turn,
+all 13 categories and the upper section bonus.  Yahtzee bonuses and
+joker rules are not modelled.
+"""
+
+import os
+import time
+import numpy
+import Yahtzee
+
+# Scorecard
+CATEGORIES = ("ones", "twos", "threes", "fours", "fives", "sixes",
+              "three_of_a_kind", "four_of_a_kind", "full_house",
+              "small_straight", "large_straight", "yahtzee", "chance")
+NUM_CATEGORIES = len(CATEGORIES)
+NUM_UPPER = 6
+UPPER_BONUS_THRESHOLD = 63
+UPPER_BONUS = 35
+NUM_DICE = 5
+NUM_SIDES = 6
+ROLLS_PER_TURN = 3
+
+# Table layout: one value per (used category mask, capped upper total)
+NUM_MASKS = 1 << NUM_CATEGORIES
+NUM_UPPER_TOTALS = UPPER_BONUS_THRESHOLD + 1
+TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "poc_yahtzee_values.npy")
+
+# States solved together when building the table
+CHUNK = 512
+
+def category_score(counts, category):
+    """
+    Score a hand, given as a face-count vector, in a category
+    """
+    total = sum([(face + 1) * counts[face] for face in range(NUM_SIDES)])
+    if category < NUM_UPPER:
+        return (category + 1) * counts[category]
+    name = CATEGORIES[category]
+    present = [count > 0 for count in counts]
+    if name == "three_of_a_kind":
+        return total if max(counts) >= 3 else 0
+    if name == "four_of_a_kind":
+        return total if max(counts) >= 4 else 0
+    if name == "full_house":
+        return 25 if sorted([count for count in counts if count]) == [2, 3] else 0
+    if name == "small_straight":
+        for start in range(NUM_SIDES - 3):
+            if all(present[start:start + 4]):
+                return 30
+        return 0
+    if name == "large_straight":
+        for start in range(NUM_SIDES - 4):
+            if all(present[start:start + 5]):
+                return 40
+        return 0
+    if name == "yahtzee":
+        return 50 if max(counts) == NUM_DICE else 0
+    return total
+
+def reachable_upper_totals(mask):
+    """
+    Return the capped upper section totals that can be reached once
+    the upper categories in mask are used
+    """
+    totals = set([0])
+    for category in range(NUM_UPPER):
+        if mask & (1 << category):
+            totals = set([min(total + (category + 1) * count, UPPER_BONUS_THRESHOLD)
+                          for total in totals for count in range(NUM_DICE + 1)])
+    return sorted(totals)
+
+
+class TurnModel:
+    """
+    Hands, holds and roll probabilities of one turn.  Hands and holds
+    are face-count vectors; holds have 0 to NUM_DICE dice.
+    """
+
+    def __init__(self):
+        """
+        Precompute the turn structures
+        """
+        self.hands = [counts for counts, dummy_weight
+                      in Yahtzee.gen_count_vectors(NUM_SIDES, NUM_DICE)]
+        self.holds = []
+        for size in range(NUM_DICE + 1):
+            self.holds.extend([counts for counts, dummy_weight
+                               in Yahtzee.gen_count_vectors(NUM_SIDES, size)])
+        hand_index = dict([(hand, idx) for idx, hand in enumerate(self.hands)])
+        hold_index = dict([(hold, idx) for idx, hold in enumerate(self.holds)])
+        self.hand_index = hand_index
+        self.hold_index = hold_index
+
+        # transition[k, h]: probability that rolling the free dice of
+        # hold k gives hand h
+        self.transition = numpy.zeros((len(self.holds), len(self.hands)))
+        for hold, row in hold_index.items():
+            free = NUM_DICE - sum(hold)
+            scale = float(NUM_SIDES ** free)
+            for roll, weight in Yahtzee.gen_count_vectors(NUM_SIDES, free):
+                hand = tuple([hold[face] + roll[face] for face in range(NUM_SIDES)])
+                self.transition[row, hand_index[hand]] = weight / scale
+        self.first_roll = self.transition[hold_index[(0,) * NUM_SIDES]]
+
+        # sub_holds[h]: indices of the holds that can be kept from hand
+        # h, padded with repeats to a common length
+        sub_holds = []
+        for hand in self.hands:
+            subs = [()]
+            for face in range(NUM_SIDES):
+                subs = [sub + (count,) for sub in subs for count in range(hand[face] + 1)]
+            sub_holds.append([hold_index[sub] for sub in subs])
+        width = max([len(subs) for subs in sub_holds])
+        self.sub_holds = numpy.array([subs + [subs[0]] * (width - len(subs))
+                                      for subs in sub_holds])
+
+        # points[c, h]: score of hand h in category c
+        self.points = numpy.array([[category_score(hand, category) for hand in self.hands]
+                                   for category in range(NUM_CATEGORIES)])
+
+    def final_values(self, values, masks, uppers):
+        """
+        Value of every hand after the last roll of a turn for a batch of
+        states: the best open category, counting its score, the upper
+        bonus and the value of the resulting state.
+
+        Returns an array of shape (states, hands)
+        """
+        flat = values.reshape(-1)
+        best = numpy.full((len(masks), len(self.hands)), -numpy.inf)
+        for category in range(NUM_CATEGORIES):
+            bit = 1 << category
+            open_states = (masks & bit) == 0
+            if not open_states.any():
+                continue
+            points = self.points[category][None, :]
+            if category < NUM_UPPER:
+                new_uppers = numpy.minimum(uppers[:, None] + points, UPPER_BONUS_THRESHOLD)
+                bonus = numpy.where((uppers[:, None] < UPPER_BONUS_THRESHOLD) &
+                                    (new_uppers == UPPER_BONUS_THRESHOLD), UPPER_BONUS, 0)
+            else:
+                new_uppers = numpy.repeat(uppers[:, None], len(self.hands), axis=1)
+                bonus = 0
+            next_values = flat[(masks | bit)[:, None] * NUM_UPPER_TOTALS + new_uppers]
+            candidate = points + bonus + next_values
+            best = numpy.where(open_states[:, None], numpy.maximum(best, candidate), best)
+        return best
+
+    def roll_back(self, hand_values):
+        """
+        Given hand values after a roll, return the values of the holds
+        before it and the values of the hands before choosing a hold
+        """
+        hold_values = hand_values.dot(self.transition.T)
+        return hold_values, hold_values[:, self.sub_holds].max(axis=2)
+
+    def turn_values(self, values, masks, uppers):
+        """
+        Return the values of a batch of states at the start of a turn
+        """
+        hand_values = self.final_values(values, masks, uppers)
+        for dummy_roll in range(ROLLS_PER_TURN - 1):
+            hand_values = self.roll_back(hand_values)[1]
+        return hand_values.dot(self.first_roll)
+
+def build_table(verbose = False):
+    """
+    Solve the game by backward induction, from full scorecards down to
+    the empty scorecard.
+
+    Returns an array of shape (NUM_MASKS, NUM_UPPER_TOTALS) holding the
+    expected final score still to come from every reachable state;
+    unreachable states hold 0.
+    """
+    model = TurnModel()
+    values = numpy.zeros((NUM_MASKS, NUM_UPPER_TOTALS))
+    for used in range(NUM_CATEGORIES - 1, -1, -1):
+        states = [(mask, upper) for mask in range(NUM_MASKS)
+                  if bin(mask).count("1") == used
+                  for upper in reachable_upper_totals(mask)]
+        for start in range(0, len(states), CHUNK):
+            chunk = numpy.array(states[start:start + CHUNK])
+            masks = chunk[:, 0]
+            uppers = chunk[:, 1]
+            values[masks, uppers] = model.turn_values(values, masks, uppers)
+        if verbose:
+            print "%2d categories used: %6d states" % (used, len(states))
+    return values
+
+def save_table(values, path = TABLE_PATH):
+    """
+    Write the value table to path as float32 in NumPy .npy format
+    """
+    numpy.save(path, values.astype(numpy.float32))
+
+def load_table(path = TABLE_PATH):
+    """
+    Memory-map a value table written by save_table
+    """
+    return numpy.load(path, mmap_mode = "r")
+
+
+class YahtzeeSolver:
+    """
+    Optimal decisions from a solved value table.  Decisions for a state
+    need only the values of the states one category further on, so
+    every query costs the same whatever the stage of the game.
+    """
+
+    def __init__(self, values, model = None):
+        """
+        Create a solver for a value table from build_table or load_table
+        """
+        self._values = values
+        if model is None:
+            model = TurnModel()
+        self._model = model
+        self._cached_state = None
+        self._cached_tables = None
+
+    def state_value(self, used, upper):
+        """
+        Return the expected score still to come at the start of a turn
+        with the categories in the bitmask used filled and upper section
+        total upper
+        """
+        return float(self._values[used, min(upper, UPPER_BONUS_THRESHOLD)])
+
+    def turn_tables(self, used, upper):
+        """
+        Return the hand and hold values of a turn for one state, from
+        the last roll back to the first, caching the latest state
+        """
+        upper = min(upper, UPPER_BONUS_THRESHOLD)
+        if self._cached_state != (used, upper):
+            masks = numpy.array([used])
+            uppers = numpy.array([upper])
+            final = self._model.final_values(numpy.asarray(self._values), masks, uppers)
+            tables = {ROLLS_PER_TURN: (None, final[0])}
+            hand_values = final
+            for rolls in range(ROLLS_PER_TURN - 1, 0, -1):
+                hold_values, hand_values = self._model.roll_back(hand_values)
+                tables[rolls] = (hold_values[0], hand_values[0])
+            self._cached_state = (used, upper)
+            self._cached_tables = tables
+        return self._cached_tables
+
+    def best_hold(self, hand, rolls_done, used, upper):
+        """
+        Choose the dice to keep after roll number rolls_done (1 or 2)
+
+        Returns a tuple with the expected score still to come and the
+        sorted tuple of dice to hold
+        """
+        hold_values = self.turn_tables(used, upper)[rolls_done][0]
+        counts = counts_of(hand)
+        best_value = None
+        best_hold = None
+        for hold_idx in set(self._model.sub_holds[self._model.hand_index[counts]]):
+            if best_value is None or hold_values[hold_idx] > best_value:
+                best_value = hold_values[hold_idx]
+                best_hold = self._model.holds[hold_idx]
+        return float(best_value), dice_of(best_hold)
+
+    def best_category(self, hand, used, upper):
+        """
+        Choose the open category to score hand in after the last roll
+
+        Returns a tuple with the expected score still to come, counting
+        this category, and the category name
+        """
+        counts = counts_of(hand)
+        hand_idx = self._model.hand_index[counts]
+        upper = min(upper, UPPER_BONUS_THRESHOLD)
+        best_value = None
+        best_category = None
+        for category in range(NUM_CATEGORIES):
+            if used & (1 << category):
+                continue
+            points = self._model.points[category, hand_idx]
+            new_upper = upper
+            bonus = 0
+            if category < NUM_UPPER:
+                new_upper = min(upper + points, UPPER_BONUS_THRESHOLD)
+                if upper < UPPER_BONUS_THRESHOLD and new_upper == UPPER_BONUS_THRESHOLD:
+                    bonus = UPPER_BONUS
+            value = points + bonus + self._values[used | (1 << category), new_upper]
+            if best_value is None or value > best_value:
+                best_value = value
+                best_category = CATEGORIES[category]
+        return float(best_value), best_category
+
+def counts_of(hand):
+    """
+    Return the face-count vector of a hand of dice
+    """
+    counts = [0] * NUM_SIDES
+    for die in hand:
+        counts[die - 1] += 1
+    return tuple(counts)
+
+def dice_of(counts):
+    """
+    Return the sorted tuple of dice of a face-count vector
+    """
+    dice = []
+    for face in range(NUM_SIDES):
+        dice.extend([face + 1] * counts[face])
+    return tuple(dice)
+
+def run_report(path = TABLE_PATH, lookups = 1000):
+    """
+    Build and save the value table, then print the build time, the
+    table size, the optimal expected game score and the latency of
+    decisions from the memory-mapped table
+    """
+    start = time.time()
+    values = build_table()
+    build_time = time.time() - start
+    save_table(values, path)
+    table = load_table(path)
+    print "build time: %.1f s" % build_time
+    print "table: %d states, %d bytes" % (table.size, table.nbytes)
+    print "expected game score: %.2f" % table[0, 0]
+
+    solver = YahtzeeSolver(table)
+    start = time.time()
+    solver.turn_tables(0, 0)
+    print "first decision in a new state: %.3f ms" % (1000.0 * (time.time() - start))
+    start = time.time()
+    for dummy_idx in range(lookups):
+        solver.best_hold((1, 1, 1, 5, 6), 1, 0, 0)
+    print "hold decision in a cached state: %.3f ms" % (1000.0 * (time.time() - start) / lookups)
+    start = time.time()
+    for dummy_idx in range(lookups):
+        solver.state_value(0, 0)
+    print "state value: %.4f ms" % (1000.0 * (time.time() - start) / lookups)
+
+#run_report()